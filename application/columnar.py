@@ -0,0 +1,69 @@
+"""
+Struct-of-arrays ("columnar") encoding of feature lists.
+
+A list of N dictionaries is encoded as {"length": N, "columns": {name: column, ...}}, with one column per property,
+so property names are sent once instead of once per feature. A column is one of:
+
+* a plain array of the N values
+* {"dictionary": [distinct values], "indices": [N indexes into the dictionary]} for properties with few distinct
+  values such as strands, types and chromosomes
+* {"offsets": [N + 1 offsets], "values": column} for properties holding a list or tuple (e.g. exons, homologs or the
+  positions of anchor points), the list of feature i being values[offsets[i]:offsets[i + 1]]; missing lists are
+  encoded as empty ones
+* {"fields": {name: column, ...}} for properties holding a dictionary (e.g. anchor points)
+"""
+
+
+# properties that are dictionary encoded
+DICTIONARY_COLUMNS = frozenset(['strand', 'gene_strand', 'type', 'gene_type', 'chr', 'gene_chr', 'ref_chr', 'comp_chr'])
+
+
+def to_columnar(rows):
+    """
+    :param rows: an iterable of dictionaries
+    :return: the columnar encoding of the rows
+    """
+    rows = list(rows)
+
+    names = []
+    seen = set()
+    for row in rows:
+        for name in row:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+    return {
+        'length': len(rows),
+        'columns': {name: _column(name, [row.get(name) for row in rows]) for name in names},
+    }
+
+
+def _column(name, values):
+    sample = next((value for value in values if value is not None), None)
+
+    if isinstance(sample, dict):
+        return {'fields': to_columnar(value or {} for value in values)['columns']}
+
+    if isinstance(sample, (list, tuple)):
+        offsets = [0]
+        flattened = []
+        for value in values:
+            if value:
+                flattened.extend(value)
+            offsets.append(len(flattened))
+        return {'offsets': offsets, 'values': _column(name, flattened)}
+
+    if name in DICTIONARY_COLUMNS:
+        dictionary = []
+        codes = {}
+        indices = []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            indices.append(code)
+        return {'dictionary': dictionary, 'indices': indices}
+
+    return values
@@ -0,0 +1,151 @@
+"""
+A small pool of read-only SQLite connections used by the query functions in
+sqliteaccess.
+
+Opening a connection means opening the database file, parsing the schema and
+starting with a cold page cache, so rather than connecting on every query we
+keep a handful of connections around and hand them out again. A connection is
+bound to the calling thread on first use and stays bound until release() is
+called (the Flask app does this when the app context is torn down), at which
+point it goes back into the pool for the next request.
+"""
+import os
+import sqlite3
+import threading
+
+try:
+    from urllib import pathname2url
+except ImportError:
+    from urllib.request import pathname2url
+
+
+class ConnectionPool(object):
+    """
+    Hands out read-only connections to a single SQLite database file.
+
+    :param db_path:     path to the SQLite database file
+    :param max_idle:    maximum number of released connections kept open for reuse; connections released
+                        while the pool is full are closed
+    :param mmap_size:   value for PRAGMA mmap_size (bytes of the database file to memory map)
+    :param cache_size:  value for PRAGMA cache_size (pages if positive, KiB if negative)
+    :param temp_store:  value for PRAGMA temp_store (DEFAULT, FILE or MEMORY)
+    """
+
+    def __init__(self, db_path, max_idle=8, mmap_size=268435456, cache_size=-16384, temp_store='MEMORY'):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.pragmas = [
+            ('mmap_size', mmap_size),
+            ('cache_size', cache_size),
+            ('temp_store', temp_store),
+        ]
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+
+        self._opened = 0
+        self._closed = 0
+        self._acquired = 0
+        self._reused = 0
+        self._in_use = 0
+
+    def _open(self):
+        """Opens a new read-only connection and applies the configured PRAGMAs"""
+        uri = 'file:{0}?mode=ro'.format(pathname2url(os.path.abspath(self.db_path)))
+        try:
+            con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        except TypeError:
+            # python 2's sqlite3 module can't open URIs, so ask SQLite to refuse writes instead
+            con = sqlite3.connect(self.db_path, check_same_thread=False)
+            con.execute('PRAGMA query_only = ON')
+
+        for name, value in self.pragmas:
+            con.execute('PRAGMA {0} = {1}'.format(name, value))
+
+        with self._lock:
+            self._opened += 1
+        return con
+
+    def connection(self):
+        """
+        Returns the connection bound to the calling thread, taking one from the pool (or opening a new one) if
+        the thread doesn't have one yet.
+
+        :return: a read-only sqlite3 connection
+        """
+        con = getattr(self._local, 'con', None)
+        if con is not None:
+            return con
+
+        with self._lock:
+            self._acquired += 1
+            self._in_use += 1
+            generation = self._generation
+            if self._idle:
+                con = self._idle.pop()
+                self._reused += 1
+
+        if con is None:
+            try:
+                con = self._open()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+
+        self._local.con = con
+        self._local.generation = generation
+        return con
+
+    def release(self):
+        """Returns the calling thread's connection, if it has one, to the pool"""
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            return
+        self._local.con = None
+
+        # make sure no half-read statement holds a read transaction open while the connection sits in the pool
+        con.rollback()
+
+        with self._lock:
+            self._in_use -= 1
+            if self._local.generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(con)
+                return
+            self._closed += 1
+        con.close()
+
+    def close_idle(self):
+        """Closes every connection currently sitting in the pool"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._closed += len(idle)
+        for con in idle:
+            con.close()
+
+    def reset(self):
+        """
+        Closes every connection currently sitting in the pool and makes sure the ones in use get closed rather than
+        pooled when they're released, e.g. because the database file has been replaced.
+        """
+        with self._lock:
+            self._generation += 1
+        self.close_idle()
+
+    def stats(self):
+        """
+        :return: a dictionary of counters describing how the pool has been used so far
+        """
+        with self._lock:
+            return {
+                'max_idle': self.max_idle,
+                'pragmas': dict(self.pragmas),
+                'opened': self._opened,
+                'closed': self._closed,
+                'acquired': self._acquired,
+                'reused': self._reused,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            }
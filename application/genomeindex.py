@@ -0,0 +1,93 @@
+"""
+Memory-mapped interval index of the genome features, shared by every worker process.
+
+db-creation/build_genome_index.py exports the start and end positions and the rowids of the genes, features (QTLs),
+syntenic blocks and homologs of every chromosome, sorted by start position, into a file of int64 arrays next to the
+database. The file is memory mapped read-only, so all the worker processes of application.serve share the same
+physical pages instead of each building structures of their own, and the rows overlapping a region are found with two
+binary searches (numpy.searchsorted) over those pages.
+
+The file starts with an 8 byte magic string and the 8 byte (little-endian) length of a JSON header, padded so that the
+arrays start on a 64 byte boundary. The header holds the id of the index, the indexed tables and, for every (table,
+taxon, chromosome, scope) key, the offset (in int64 items from the start of the arrays) and length of its interval
+set. An interval set of n rows is four consecutive arrays of n items: the starts (sorted), the ends, the running
+maximum of the ends and the rowids.
+
+The first row that can overlap a region is found through the running maximum of the ends, so a long interval early on
+a chromosome (e.g. a QTL spanning most of it) holds that maximum up and every region after it has to scan the rows
+from that interval onwards. Callers bound that work with the max_scan argument of GenomeIndex.overlapping.
+"""
+import json
+import struct
+
+import numpy as np
+
+
+MAGIC = b'SYNIDX01'
+ALIGNMENT = 64
+
+
+def interval_key(table, taxon_id, chromosome, scope=''):
+    """
+    :return: the header key of the interval set of one taxon, chromosome and scope (the comparison taxon for
+             homologs, '' otherwise) of a table
+    """
+    return u'\t'.join([table, u'{0}'.format(taxon_id), u'{0}'.format(chromosome), u'{0}'.format(scope)])
+
+
+class GenomeIndex(object):
+    """
+    Looks up the rows of the indexed tables overlapping genomic regions.
+
+    :param path: the index file written by db-creation/build_genome_index.py
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as index_file:
+            magic, header_length = struct.unpack('<8sQ', index_file.read(16))
+            if magic != MAGIC:
+                raise ValueError('{0} is not a genome index'.format(path))
+            header = json.loads(index_file.read(header_length).decode('utf-8'))
+
+        self.index_id = header['index_id']
+        self.tables = frozenset(header['tables'])
+        self._intervals = header['intervals']
+
+        data_offset = (16 + header_length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        self._data = np.memmap(path, dtype='<i8', mode='r', offset=data_offset)
+
+    def overlapping(self, table, taxon_id, chromosome, start, end, scope='', max_scan=None):
+        """
+        Finds the rows of a table overlapping a region.
+
+        :param table:       the indexed table
+        :param taxon_id:    the NCBI taxonomy ID of the genome
+        :param chromosome:  the chromosome of the region
+        :param start:       the start position (base pairs) of the region
+        :param end:         the end position (base pairs) of the region
+        :param scope:       the comparison taxon for homologs, '' otherwise
+        :param max_scan:    the maximum number of rows to scan for the overlapping ones, None for no limit
+        :return: an array of the rowids of the overlapping rows, or None if the table isn't indexed or more than
+                 max_scan rows would have to be scanned
+        """
+        if table not in self.tables:
+            return None
+
+        interval_set = self._intervals.get(interval_key(table, taxon_id, chromosome, scope))
+        if interval_set is None:
+            return np.empty(0, dtype=np.int64)
+
+        offset, length = interval_set
+        starts, ends, max_ends, rowids = (
+            self._data[offset + i * length:offset + (i + 1) * length] for i in range(4)
+        )
+
+        # rows from the first one whose (running maximum) end reaches the region to the last one starting inside it
+        first = np.searchsorted(max_ends, start, side='left')
+        last = np.searchsorted(starts, end, side='right')
+        if first >= last:
+            return np.empty(0, dtype=np.int64)
+        if max_scan is not None and last - first > max_scan:
+            return None
+        return rowids[first:last][ends[first:last] >= start]
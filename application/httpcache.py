@@ -0,0 +1,88 @@
+"""
+HTTP validators for the JSON endpoints.
+
+Responses only depend on the request (path and query string) and on the database build, so an ETag is derived from
+those two alone, without running the view. A client (or a proxy in front of the application) that already has the
+current response gets a 304 Not Modified without SQLite being touched at all.
+"""
+import functools
+import hashlib
+import os
+from datetime import datetime
+
+from flask import make_response, request, Response
+
+from application import sqliteaccess as dba
+from application import wireformats
+
+
+# how long (in seconds) clients and proxies may reuse a response before revalidating it; 0 makes them revalidate
+# every time
+MAX_AGE = int(os.environ.get('SYNTENY_HTTP_MAX_AGE', 3600))
+
+# binary formats a response may be served as (see wireformats), each of which gets its own ETag, as do the content
+# encodings of jsonAPI.materialized
+_MIMETYPE_VARIANTS = {
+    wireformats.ARROW_STREAM_MIMETYPE: 'arrow',
+    wireformats.MSGPACK_MIMETYPE: 'msgpack',
+}
+
+
+def _request_etag(build_id):
+    """The ETag of the identity encoded response to the current request"""
+    args = sorted(request.args.items(multi=True))
+    key = u'\0'.join([build_id, request.path] + [u'{0}={1}'.format(name, value) for name, value in args])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _variant_etag(etag, variant):
+    """The ETag of a variant (content encoding or binary format) of a response, given its identity ETag"""
+    if variant is None:
+        return etag
+    return '{0}-{1}'.format(etag, _MIMETYPE_VARIANTS.get(variant, variant))
+
+
+def _add_validators(response, etag, build_info, vary):
+    response.set_etag(etag)
+    response.last_modified = datetime.utcfromtimestamp(build_info['built_at'])
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+    if vary is not None:
+        response.vary.add(vary)
+    return response
+
+
+def conditional(view):
+    """
+    Decorates a GET view so that its responses carry an ETag, a Last-Modified date and a Cache-Control max-age, and
+    so that conditional requests for a response the client already has are answered with a 304.
+
+    Views whose responses come in several representations declare it with a response_variant attribute, a (request
+    header, function) tuple: the function returns the content encoding or mimetype the current request will be
+    answered with (None for the identity encoded JSON), which picks the ETag a 304 is matched against, and every
+    response, 304s included, varies on the header.
+    """
+    vary, get_variant = getattr(view, 'response_variant', (None, None))
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        build_info = dba.get_build_info()
+        etag = _request_etag(build_info['build_id'])
+
+        if request.if_none_match or request.if_modified_since:
+            variant_etag = _variant_etag(etag, get_variant() if get_variant is not None else None)
+            if request.if_none_match:
+                if request.if_none_match.contains(variant_etag):
+                    return _add_validators(Response(status=304), variant_etag, build_info, vary)
+            elif request.if_modified_since >= datetime.utcfromtimestamp(build_info['built_at']):
+                return _add_validators(Response(status=304), variant_etag, build_info, vary)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+
+        # the ETag describes what was actually sent
+        variant = response.content_encoding or (response.mimetype if response.mimetype in _MIMETYPE_VARIANTS else None)
+        return _add_validators(response, _variant_etag(etag, variant), build_info, vary)
+
+    return wrapper
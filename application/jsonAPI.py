@@ -1,52 +1,335 @@
-import json
-from flask import jsonify
+import functools
+import os
+from flask import make_response, request, Response, stream_with_context
+from application import serialization
 from application import sqliteaccess as dba
+from application import wireformats
 from application import app
+from application.columnar import to_columnar
+from application.httpcache import conditional
+from application.jsonstream import streamed_json
+from application.serialization import json_response
+from application.liftover import get_liftover_index
+
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """
+    Returns the request's database connection to the pool once the app context goes away.
+    """
+    dba.release_db_connection()
+
+
+@app.route('/server-stats.json')
+def server_stats():
+    """
+    Reports runtime counters that are useful when tuning a deployment.
+
+    :return: (str) a JSON formatted string with the database connection pool and query cache statistics
+    """
+    return json_response({
+        'db_pool': dba.get_pool_stats(),
+        'query_cache': dba.get_cache_stats(),
+    })
+
+
+# content encodings that render_payloads.py stores response bodies in, most preferred first
+MATERIALIZED_ENCODINGS = ('br', 'gzip')
+
+
+def materialized(view):
+    """
+    Decorates a view so that a response body rendered ahead of time by render_payloads.py is served for the request
+    path, when the database has one in an encoding the client accepts, without running the view's queries.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        encoding = _materialized_encoding()
+        if encoding is not None:
+            payload = dba.get_materialized_payload(request.path, [encoding])
+            if payload is not None:
+                body, encoding, mimetype = payload
+                response = Response(body, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        return view(*args, **kwargs)
+
+    wrapper.response_variant = ('Accept-Encoding', _materialized_encoding)
+    return wrapper
+
+
+def _materialized_encoding():
+    """
+    :return: the content encoding of the pre-rendered body materialized serves for the current request, or None if
+             the view will run
+    """
+    if not app.config.get('SERVE_MATERIALIZED_PAYLOADS', True) or request.args:
+        return None
+    encodings = dba.get_materialized_encodings(request.path)
+    for encoding in MATERIALIZED_ENCODINGS:
+        if encoding in encodings and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def cached_response(view):
+    """
+    Decorates a view so that the encoded body of its JSON responses is kept in the query cache (until the database
+    changes) and sent as it is to later requests for the same path, query string and format. Streamed responses are
+    still streamed from the database the first time: their chunks are collected as they're sent and cached once the
+    last one has gone out, unless they add up to more than the cache can hold.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = ('response', request.path, tuple(sorted(request.args.items(multi=True))), wireformats.negotiate())
+        cached = dba.query_cache.get(key)
+        if cached is not None:
+            body, vary = cached
+            response = Response(body, mimetype='application/json')
+            response.vary.update(vary)
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.mimetype != 'application/json' or response.content_encoding:
+            return response
+
+        vary = tuple(response.vary)
+        if response.is_streamed:
+            response.response = _cache_chunks(key, vary, response.response)
+        else:
+            body = response.get_data()
+            dba.query_cache.put(key, (body, vary), len(body))
+        return response
+
+    return wrapper
+
+
+def _cache_chunks(key, vary, chunks):
+    """
+    Passes the chunks of a streamed response body on, putting the whole body in the query cache once every chunk has
+    been sent. Nothing is cached if the client goes away first.
+    """
+    collected = []
+    size = 0
+    try:
+        for chunk in chunks:
+            if collected is not None:
+                size += len(chunk)
+                if size > dba.query_cache.max_bytes:
+                    # too large to ever be cached, so there's no point in holding on to it
+                    collected = None
+                else:
+                    collected.append(chunk)
+            yield chunk
+
+        if collected is not None:
+            dba.query_cache.put(key, (b''.join(collected), vary), size)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _features_response(key, features, **properties):
+    """
+    Builds the response of the gene, block and QTL routes: {key: [feature, ...]} streamed as the features are read,
+    or, when the format=columnar query parameter is given, its columnar encoding (see application.columnar).
+
+    :param key:         the name of the response object's property holding the features
+    :param features:    an iterable of feature dictionaries
+    :param properties:  other properties of the response object, if any; such responses aren't streamed
+    :return: the response
+    """
+    response_format = request.args.get('format')
+    if response_format == 'columnar':
+        features = to_columnar(features)
+    elif response_format is not None:
+        return json_response({'error': 'unknown format {0}, expected columnar'.format(response_format)}, 400)
+    elif not properties:
+        return streamed_json(key, features)
+    else:
+        features = list(features)
+
+    properties[key] = features
+    return json_response(properties)
+
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def _page_response(key, get_page, taxon_id, symbol_key, id_key):
+    """
+    Builds a page of the gene or QTL list of a species. The page starts after the 'after' query parameter, either a
+    symbol or the 'next' cursor of the previous page, and has at most 'limit' (default DEFAULT_PAGE_SIZE) features.
+    The response's 'next' property is the cursor of the following page, or null on the last page.
+
+    :param key:         the name of the response object's property holding the features
+    :param get_page:    the sqliteaccess function returning a page of features
+    :param taxon_id:    the taxon to list the features of
+    :param symbol_key:  the feature property holding the symbol
+    :param id_key:      the feature property holding the id
+    :return: the response
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after_symbol, after_id = _parse_page_cursor(request.args.get('after'))
+
+    # reading one more feature than needed tells whether there's a next page
+    features = list(get_page(taxon_id, after_symbol, after_id, limit + 1))
+    next_cursor = None
+    if len(features) > limit:
+        features = features[:limit]
+        next_cursor = u'{0}|{1}'.format(features[-1][symbol_key], features[-1][id_key])
+
+    return _features_response(key, features, next=next_cursor)
+
+
+def _parse_page_cursor(cursor):
+    """
+    :param cursor: a 'symbol|id' page cursor, a bare symbol or None
+    :return: a (symbol, id) tuple; either may be None
+    """
+    if not cursor:
+        return None, None
+    if '|' in cursor:
+        symbol, feature_id = cursor.rsplit('|', 1)
+        return symbol, feature_id
+    return cursor, None
+
+
+def _bulk_response(key, get_features, get_columns):
+    """
+    Builds the response of the whole genome data routes, which can also be sent in one of the binary formats of
+    application.wireformats when the client's Accept header asks for it.
+
+    :param key:             the name of the JSON response object's property holding the features
+    :param get_features:    a function returning an iterable of feature dictionaries
+    :param get_columns:     a function returning the same features as column batches (see sqliteaccess._column_batches)
+    :return: the response
+    """
+    mimetype = wireformats.negotiate()
+    if mimetype is not None:
+        return wireformats.binary_response(mimetype, get_columns())
+
+    response = _features_response(key, get_features())
+    response.vary.add('Accept')
+    return response
+
+
+MAX_BATCH_GENES = 10000
+
+
+def _posted_gene_list():
+    """
+    Reads the list of genes posted as {"genes": [...]} in the body of the current request.
+
+    :return: a (gene list, error response) tuple, one of which is None
+    """
+    body = request.get_json(force=True, silent=True)
+    genes = body.get('genes') if isinstance(body, dict) else None
+    if not isinstance(genes, list) or not all(isinstance(gene, (type(u''), str)) for gene in genes):
+        return None, json_response({'error': 'expected a JSON object with a list of gene symbols and/or IDs as genes'},
+                                   400)
+    if len(genes) > MAX_BATCH_GENES:
+        return None, json_response({'error': 'at most {0} genes can be looked up at once'.format(MAX_BATCH_GENES)},
+                                   400)
+    return genes, None
 
 
 @app.route('/gene-assoc-type-info/<taxon_id>/<gene_list>.json')
+@conditional
 def gene_assoc_type_info(taxon_id, gene_list):
     gt_information = dba.get_gt_assoc_info(taxon_id, gene_list)
-    return json.dumps(list(gt_information))
+    return json_response(list(gt_information))
+
+
+@app.route('/gene-assoc-type-info/<taxon_id>', methods=['POST'])
+def gene_list_assoc_type_info(taxon_id):
+    """
+    Gets the types of a list of genes too long for the /gene-assoc-type-info/<taxon_id>/<gene_list>.json URL. The
+    request body is a JSON object {"genes": ["Kit", "Pax6", ...]} of up to MAX_BATCH_GENES gene symbols.
+
+    :param taxon_id: NCBI species taxonomy id
+    :return: the distinct gene types, as for /gene-assoc-type-info/<taxon_id>/<gene_list>.json
+    """
+    gene_list, error = _posted_gene_list()
+    if error is not None:
+        return error
+    return json_response(list(dba.get_gt_assoc_info(taxon_id, gene_list)))
+
+
+MAX_AUTOCOMPLETE_LIMIT = 100
 
 
 @app.route('/fetch-autocomplete-terms/<search_cat>/<search_id>.json')
+@conditional
 def fetch_autocomplete_terms(search_cat, search_id):
     """
     Generates suggestions used to feed the type-ahead (autocomplete) UI input component.
 
+    When the 'q' query parameter is given only the top 'limit' (default 20) suggestions for
+    that prefix are returned, otherwise every term of the category is.
+
     :param (str) search_cat: search category, currently one among {gene, qtl, ont}
     :param (str) search_id: if the search category is 'ontology' then this argument represents
     an 'ontology id', else it represents a 'taxonomy id'
     :return: (str) a JSON formatted string of suggestions
     """
+    prefix = request.args.get('q')
+    if prefix is not None:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_AUTOCOMPLETE_LIMIT)
+        suggest_terms = dba.get_autocomplete_terms(search_cat, search_id, prefix.strip(), limit)
+        return json_response(list(suggest_terms))
+
     if search_cat == 'qtl':
         suggest_terms = dba.get_qtl_symbols(search_id)
-        return json.dumps(list(suggest_terms))
+        return json_response(list(suggest_terms))
     elif search_cat == 'gene':
         suggest_terms = dba.get_gene_symbols(search_id)
-        return json.dumps(list(suggest_terms))
+        return json_response(list(suggest_terms))
     elif search_cat == 'ont':
         suggest_terms = dba.get_ont_terms_ids(search_id)
-        return json.dumps(list(suggest_terms))
+        return json_response(list(suggest_terms))
     else:
         suggest_terms = ""
-        return json.dumps(list(suggest_terms))
+        return json_response(list(suggest_terms))
 
 
 @app.route('/gene-info/<taxon_id>/<gene_symbol>.json')
+@conditional
 def gene_info(taxon_id, gene_symbol):
     gene_information = dba.get_gene_info(taxon_id, gene_symbol)
-    return json.dumps(list(gene_information))
+    return json_response(list(gene_information))
+
+
+@app.route('/gene-info/<taxon_id>', methods=['POST'])
+def genes_info(taxon_id):
+    """
+    Looks up a batch of genes (e.g. an uploaded gene list) in one request rather than one /gene-info request per
+    gene. The request body is a JSON object {"genes": ["Kit", "MGI:96677", ...]} of up to MAX_BATCH_GENES gene
+    symbols and/or gene IDs, which are matched exactly.
+
+    :param taxon_id: NCBI species taxonomy id
+    :return: {"genes": [gene records with their homologs, as for /gene-info], "unresolved": [unmatched identifiers]}
+    """
+    identifiers, error = _posted_gene_list()
+    if error is not None:
+        return error
+
+    genes, unresolved = dba.get_genes_info(taxon_id, identifiers)
+    return json_response({'genes': genes, 'unresolved': unresolved})
 
 
 @app.route('/qtl-info/<taxon_id>/<qtl_symbol>.json')
+@conditional
 def qtl_info(taxon_id, qtl_symbol):
     qtl_information = dba.get_qtl_info(taxon_id, qtl_symbol)
-    return json.dumps(list(qtl_information))
+    return json_response(list(qtl_information))
 
 
 @app.route('/ont-info/<taxon_id>/<ont_abbrev>/<ont_term>.json')
+@conditional
 def species_ont_info(taxon_id, ont_abbrev, ont_term):
     '''
     Finds ontology entries that match the searched term and returns
@@ -58,10 +341,11 @@ def species_ont_info(taxon_id, ont_abbrev, ont_term):
     :return: dictionary objects list containing ontology and gene information
     '''
     ont_information = dba.get_species_genes_labeled_with_term(taxon_id, ont_abbrev, ont_term)
-    return json.dumps(list(ont_information))
+    return json_response(list(ont_information))
 
 
 @app.route('/ont-info/<ont_abbrev>/<ont_term>.json')
+@conditional
 def ont_info(ont_abbrev, ont_term):
     '''
     Finds ontology entries that match the searched term and returns
@@ -73,10 +357,11 @@ def ont_info(ont_abbrev, ont_term):
     :return: dictionary objects list containing ontology and gene information
     '''
     ont_information = dba.get_genes_labeled_with_term(ont_abbrev, ont_term)
-    return json.dumps(list(ont_information))
+    return json_response(list(ont_information))
 
 
 @app.route('/count-ont-children/<ont_id>/<ont_term>.json')
+@conditional
 def count_ont_children(ont_id, ont_term):
     '''
 
@@ -89,29 +374,238 @@ def count_ont_children(ont_id, ont_term):
     if count != None:
         d = {'num_children': count}
 
-    return json.dumps(d)
+    return json_response(d)
 
 
 @app.route('/syntenic-blocks/<ref_taxonid>/<comp_taxonid>/<ref_chr>-blocks.json')
+@conditional
+@materialized
+@cached_response
 def syntenic_blocks_json(ref_taxonid, comp_taxonid, ref_chr):
     blocks = dba.get_blocks(ref_taxonid, comp_taxonid, True, ref_chr)
-    return jsonify(blocks=list(blocks))
+    return _features_response('blocks', blocks)
 
 
 @app.route('/syntenic-blocks/<ref_taxonid>/<comp_taxonid>/blocks.json')
+@conditional
+@cached_response
 def all_syntenic_blocks_json(ref_taxonid, comp_taxonid):
     blocks = dba.get_blocks(ref_taxonid, comp_taxonid)
-    return jsonify(blocks=list(blocks))
+    return _features_response('blocks', blocks)
 
 
 @app.route('/genes-in-interval/<ref_taxonid>/chr<ref_chr>-genes.json')
+@conditional
+@cached_response
 def genes_in_interval(ref_taxonid, ref_chr):
     genes = dba.get_genes(ref_taxonid, ref_chr)
-    return jsonify(genes=list(genes))
+    return _features_response('genes', genes)
+
+
+@app.route('/genes-in-region/<ref_taxonid>/<ref_chr>:<int:start>-<int:end>')
+@conditional
+def genes_in_region(ref_taxonid, ref_chr, start, end):
+    genes = dba.get_genes_in_region(ref_taxonid, ref_chr, start, end)
+    return _features_response('genes', genes)
+
+
+@app.route('/qtls-in-region/<taxon_id>/<chromosome>:<int:start>-<int:end>')
+@conditional
+def qtls_in_region(taxon_id, chromosome, start, end):
+    qtls = dba.get_qtls_in_region(taxon_id, chromosome, start, end)
+    return _features_response('qtls', qtls)
+
+
+@app.route('/syntenic-blocks-in-region/<ref_taxonid>/<comp_taxonid>/<ref_chr>:<int:start>-<int:end>')
+@conditional
+def syntenic_blocks_in_region(ref_taxonid, comp_taxonid, ref_chr, start, end):
+    blocks = dba.get_blocks_in_region(ref_taxonid, comp_taxonid, ref_chr, start, end)
+    return _features_response('blocks', blocks)
+
+
+# regions spanning more bases than this are summarized in bins by the level of detail route
+LOD_SPAN_THRESHOLD = int(os.environ.get('SYNTENY_LOD_SPAN_THRESHOLD', 5000000))
+DEFAULT_LOD_BINS = 1000
+MAX_LOD_BINS = 10000
+
+
+@app.route('/genes-lod/<ref_taxonid>/<comp_taxonid>/<ref_chr>:<int:start>-<int:end>')
+@conditional
+def genes_lod(ref_taxonid, comp_taxonid, ref_chr, start, end):
+    """
+    Gets the genes of a reference region at a level of detail suited to the view. Regions spanning more than
+    LOD_SPAN_THRESHOLD bases are split into (at most) 'bins' bins (default DEFAULT_LOD_BINS, roughly the number of
+    pixels the view has to draw them in) and only a summary of each bin is returned, smaller regions get full gene
+    records.
+
+    :return: either {"level": "summary", "bin_size": <bases>, "bins": [...]} with the bins described in
+             sqliteaccess.get_region_bin_summaries, or {"level": "genes", "genes": [...]} with the genes described in
+             sqliteaccess.get_genes
+    """
+    if end < start:
+        return json_response({'error': 'the region end comes before its start'}, 400)
+
+    if end - start + 1 <= LOD_SPAN_THRESHOLD:
+        genes = dba.get_genes_in_region(ref_taxonid, ref_chr, start, end)
+        return _features_response('genes', genes, level='genes')
+
+    bin_count = min(max(request.args.get('bins', DEFAULT_LOD_BINS, type=int), 1), MAX_LOD_BINS)
+    bin_size, bins = dba.get_region_bin_summaries(ref_taxonid, comp_taxonid, ref_chr, start, end, bin_count)
+    return _features_response('bins', bins, level='summary', bin_size=bin_size)
+
+
+@app.route('/feature-density/<taxon_id>/<chromosome>:<int:start>-<int:end>')
+@conditional
+def feature_density(taxon_id, chromosome, start, end):
+    """
+    Gets the number of features overlapping the bins of a region (see sqliteaccess.get_region_density). The 'feature'
+    query parameter is one of gene (the default), qtl, homolog and ont, the 'scope' parameter the comparison taxon
+    for homologs and the ontology abbreviation for ont, and 'bins' the maximum number of bins wanted.
+
+    :return: {"feature": ..., "scope": ..., "bin_size": <bases>, "bins": [{"start": ..., "end": ..., "count": ...}]}
+    """
+    feature = request.args.get('feature', 'gene')
+    scope = request.args.get('scope', '')
+    if feature not in dba.DENSITY_FEATURES:
+        return json_response({'error': 'unknown feature {0}, expected one of {1}'.format(
+            feature, ', '.join(dba.DENSITY_FEATURES))}, 400)
+    if start < 1:
+        return json_response({'error': 'positions start at 1'}, 400)
+    if end < start:
+        return json_response({'error': 'the region end comes before its start'}, 400)
+
+    bin_count = min(max(request.args.get('bins', DEFAULT_LOD_BINS, type=int), 1), MAX_LOD_BINS)
+    bin_size, bins = dba.get_region_density(taxon_id, chromosome, start, end, feature, scope, bin_count)
+    return _features_response('bins', bins, feature=feature, scope=scope, bin_size=bin_size)
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson')
+LIFTOVER_NDJSON_BATCH_SIZE = 10000
+LIFTOVER_ITEM_ERROR = 'positions need chr and pos, intervals need chr, start and end'
+
+
+@app.route('/liftover/<ref_taxonid>/<comp_taxonid>', methods=['POST'])
+def liftover(ref_taxonid, comp_taxonid):
+    """
+    Maps a batch of reference genome positions and/or intervals onto the comparison genome using the
+    anchor points of the syntenic blocks.
+
+    The request body is either a JSON object of the form
+    {"positions": [{"chr": "1", "pos": 3000000}, ...], "intervals": [{"chr": "1", "start": 3000000, "end": 3100000}, ...]}
+    or, when sent as application/x-ndjson, a stream of such position and interval objects, one per line, in
+    which case the results are streamed back the same way, one line per input line (an error object for a line that
+    isn't a valid position or interval, blank lines included).
+
+    :param ref_taxonid: NCBI species taxonomy id of the reference genome
+    :param comp_taxonid: NCBI species taxonomy id of the comparison genome
+    :return: the input positions and intervals extended with their comparison coordinates and block ids
+    (see LiftoverIndex.lift_positions and LiftoverIndex.lift_intervals)
+    """
+    index = get_liftover_index(ref_taxonid, comp_taxonid)
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        return Response(stream_with_context(_lift_ndjson(index, request.stream)), mimetype='application/x-ndjson')
+
+    body = request.get_json(force=True, silent=True)
+    if not isinstance(body, dict):
+        return json_response({'error': 'expected a JSON object with positions and/or intervals'}, 400)
+
+    positions = body.get('positions', [])
+    intervals = body.get('intervals', [])
+    if not isinstance(positions, list) or not isinstance(intervals, list) or \
+            not all(_valid_liftover_item(position, ('pos',)) for position in positions) or \
+            not all(_valid_liftover_item(interval, ('start', 'end')) for interval in intervals):
+        return json_response({'error': LIFTOVER_ITEM_ERROR}, 400)
+
+    return json_response({
+        'positions': index.lift_positions(positions),
+        'intervals': index.lift_intervals(intervals),
+    })
+
+
+def _lift_ndjson(index, stream):
+    """
+    Lifts positions and intervals read one per line from stream, LIFTOVER_NDJSON_BATCH_SIZE lines at a time.
+
+    :param index: the LiftoverIndex to map with
+    :param stream: the request stream
+    :return: a generator of NDJSON lines
+    """
+    batch = []
+    for line in stream:
+        batch.append(line.strip())
+        if len(batch) >= LIFTOVER_NDJSON_BATCH_SIZE:
+            yield _lift_ndjson_batch(index, batch)
+            batch = []
+    if batch:
+        yield _lift_ndjson_batch(index, batch)
+
+
+def _lift_ndjson_batch(index, lines):
+    """
+    Lifts a batch of NDJSON lines. A line that isn't a valid position or interval gets an error object of its own,
+    the other lines of the batch are lifted as usual.
+
+    :param index: the LiftoverIndex to map with
+    :param lines: the lines of the batch
+    :return: the NDJSON lines of the results, one per input line, in order
+    """
+    results = [None] * len(lines)
+    positions = []
+    intervals = []
+    for i, line in enumerate(lines):
+        item = _liftover_item(line)
+        if item is None:
+            results[i] = {'error': LIFTOVER_ITEM_ERROR}
+        elif 'pos' in item:
+            positions.append((i, item))
+        else:
+            intervals.append((i, item))
+
+    if positions:
+        lifted = index.lift_positions([item for _, item in positions])
+        for (i, _), result in zip(positions, lifted):
+            results[i] = result
+    if intervals:
+        lifted = index.lift_intervals([item for _, item in intervals])
+        for (i, _), result in zip(intervals, lifted):
+            results[i] = result
+
+    return b''.join(serialization.dumps(result) + b'\n' for result in results)
+
+
+def _liftover_item(line):
+    """
+    :param line: an NDJSON line
+    :return: the position or interval object on the line, or None if it isn't one
+    """
+    try:
+        item = serialization.loads(line)
+    except ValueError:
+        return None
+    keys = ('pos',) if isinstance(item, dict) and 'pos' in item else ('start', 'end')
+    if not _valid_liftover_item(item, keys):
+        return None
+    return item
+
+
+def _valid_liftover_item(item, keys):
+    """
+    :param item:    a position or interval object from the request
+    :param keys:    the coordinate properties it must have, ('pos',) for positions and ('start', 'end') for intervals
+    :return: whether the item has a chr and coordinates that convert to the 64-bit integers LiftoverIndex maps
+    """
+    if not isinstance(item, dict) or 'chr' not in item:
+        return False
+    try:
+        return all(-2 ** 63 <= int(item[key]) < 2 ** 63 for key in keys)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return False
 
 
 @app.route('/genome-colors')
 @app.route('/ChrColorScheme.json')
+@conditional
 def chr_color_scheme_json():
     chr_colors = {
         "1": "#f74600",
@@ -140,58 +634,97 @@ def chr_color_scheme_json():
         "Y": "#ea9399"
     }
 
-    return json.dumps(chr_colors)
+    return json_response(chr_colors)
 
 
 @app.route('/species', methods=['GET'])
+@conditional
+@cached_response
 def get_species():
     species = dba.get_species()
-    return json.dumps({'species': list(species)})
+    return json_response({'species': list(species)})
 
 
 @app.route('/genes/<taxon_id>', methods=['GET'])
+@conditional
+@wireformats.negotiated
 def get_all_genes(taxon_id):
-    genes = dba.get_gene_metadata(taxon_id)
-    return json.dumps({'genes': list(genes)})
+    if 'after' in request.args or 'limit' in request.args:
+        return _page_response('genes', dba.get_gene_metadata_page, taxon_id, 'gene_symbol', 'gene_id')
+
+    return _bulk_response(
+        'genes',
+        functools.partial(dba.get_gene_metadata, taxon_id),
+        functools.partial(dba.get_gene_metadata_columns, taxon_id))
 
 
 @app.route('/genes/<taxon_id>/<gene_symbol>', methods=['GET'])
+@conditional
 def get_genes(taxon_id, gene_symbol):
     genes = dba.get_gene_metadata(taxon_id, gene_symbol)
-    return json.dumps({'genes': list(genes)})
+    return _features_response('genes', genes)
 
 
 @app.route('/qtls/<taxon_id>', methods=['GET'])
+@conditional
 def get_all_qtls(taxon_id):
+    if 'after' in request.args or 'limit' in request.args:
+        return _page_response('qtls', dba.get_qtl_metadata_page, taxon_id, 'qtl_symbol', 'qtl_id')
+
     qtls = dba.get_qtl_metadata(taxon_id)
-    return json.dumps({'qtls': list(qtls)})
+    return _features_response('qtls', qtls)
 
 
 @app.route('/qtls/<taxon_id>/<qtl_symbol>', methods=['GET'])
+@conditional
 def get_qtls(taxon_id, qtl_symbol):
     qtls = dba.get_qtl_metadata(taxon_id, qtl_symbol)
-    return json.dumps({'qtls': list(qtls)})
+    return _features_response('qtls', qtls)
 
 
 @app.route('/syntenic-blocks/<ref_taxonid>/<comp_taxonid>', methods=['GET'])
+@conditional
+@wireformats.negotiated
+@cached_response
 def genome_blocks(ref_taxonid, comp_taxonid):
-    blocks = dba.get_genome_blocks(ref_taxonid, comp_taxonid)
-    return jsonify(blocks=list(blocks))
+    return _bulk_response(
+        'blocks',
+        functools.partial(dba.get_genome_blocks, ref_taxonid, comp_taxonid),
+        functools.partial(dba.get_genome_block_columns, ref_taxonid, comp_taxonid))
+
+
+@app.route('/homologs/<ref_taxonid>/<comp_taxonid>', methods=['GET'])
+@conditional
+@wireformats.negotiated
+def genome_homologs(ref_taxonid, comp_taxonid):
+    return _bulk_response(
+        'homologs',
+        functools.partial(dba.get_homologs, ref_taxonid, comp_taxonid),
+        functools.partial(dba.get_homolog_columns, ref_taxonid, comp_taxonid))
 
 
 @app.route('/syntenic-blocks/<ref_taxonid>/<comp_taxonid>/<chr>', methods=['GET'])
+@conditional
+@materialized
+@cached_response
 def chromsome_blocks(ref_taxonid, comp_taxonid, chr):
     blocks = dba.get_chromosome_blocks(ref_taxonid, comp_taxonid, chr)
-    return jsonify(blocks=list(blocks))
+    return _features_response('blocks', blocks)
 
 
 @app.route('/chr-genes/<ref_taxonid>/<comp_taxonid>/<ref_chr>')
+@conditional
+@materialized
+@cached_response
 def chromosome_genes(ref_taxonid, comp_taxonid, ref_chr):
     genes = dba.get_genes(ref_taxonid, ref_chr)
-    return jsonify(genes=list(genes))
+    return _features_response('genes', genes)
 
 
 @app.route('/chr-qtls/<taxon_id>/<chromosome>')
+@conditional
+@materialized
+@cached_response
 def get_qtls_by_chr(taxon_id, chromosome):
     qtls = dba.get_qtls_by_chr(taxon_id, chromosome)
-    return jsonify(qtls=list(qtls))
+    return _features_response('qtls', qtls)
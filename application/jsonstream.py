@@ -0,0 +1,57 @@
+"""
+Incremental JSON encoding for responses with a whole chromosome or genome worth of items.
+
+Rather than building the complete list of items and then the complete JSON string, the items are encoded one at a
+time as the query generator produces them and sent in chunks, so the memory needed by a request (and the time until
+its first byte) doesn't grow with the size of the chromosome.
+"""
+from flask import Response, stream_with_context
+
+from application import serialization
+
+
+# encoded items are collected into chunks of (at least) this many bytes before being sent
+STREAM_CHUNK_SIZE = 65536
+
+
+def iter_json_object(key, items, dumps=None):
+    """
+    Encodes {key: [item, ...]} incrementally.
+
+    :param key:     the name of the object's only property
+    :param items:   an iterable of JSON serializable items
+    :param dumps:   the function encoding a single value to bytes, serialization.dumps by default
+    :return: a generator of encoded JSON chunks which, joined, make up the encoded object
+    """
+    if dumps is None:
+        dumps = serialization.dumps
+
+    chunk = [b'{', dumps(key), b':[']
+    chunk_size = 0
+    separator = b''
+    for item in items:
+        encoded = dumps(item)
+        chunk.append(separator)
+        chunk.append(encoded)
+        separator = b','
+
+        chunk_size += len(encoded)
+        if chunk_size >= STREAM_CHUNK_SIZE:
+            yield b''.join(chunk)
+            chunk = []
+            chunk_size = 0
+
+    chunk.append(b']}')
+    yield b''.join(chunk)
+
+
+def streamed_json(key, items):
+    """
+    Builds a response streaming {key: [item, ...]} as items are produced. The request context (and so the pooled
+    database connection the items are read with) is kept until the last item has been sent.
+
+    :param key:     the name of the object's only property
+    :param items:   an iterable of JSON serializable items, e.g. a sqliteaccess generator
+    :return: a chunked application/json response
+    """
+    return Response(stream_with_context(iter_json_object(key, items)), mimetype='application/json')
@@ -0,0 +1,194 @@
+"""
+Coordinate lift-over from a reference genome to a comparison genome.
+
+The match anchor points of the syntenic blocks (see sqliteaccess.get_blocks) pair up reference and comparison
+positions, so between two consecutive anchors of a block a reference position maps linearly onto the comparison
+genome. For every reference chromosome the anchors of all of its blocks are kept in one sorted array, which lets a
+whole batch of positions be located with a single binary search (numpy.searchsorted) and interpolated at once.
+"""
+import numpy as np
+
+from application import sqliteaccess as dba
+
+
+class LiftoverIndex(object):
+    """
+    Maps reference positions to comparison positions for one reference/comparison genome pair.
+
+    :param blocks: an iterable of block dictionaries including anchor points, as returned by
+                   sqliteaccess.get_blocks(ref_taxon, comp_taxon, include_anchors=True)
+    """
+
+    def __init__(self, blocks):
+        self.block_ids = []
+        self.block_comp_chrs = []
+
+        anchors = {}
+        for block in blocks:
+            block_index = len(self.block_ids)
+            self.block_ids.append(block['symbol'])
+            self.block_comp_chrs.append(block['comp_chr'])
+
+            ref_anchors = block['match_anchor_points']['ref_anchor_points']
+            comp_anchors = block['match_anchor_points']['comp_anchor_points']
+            chr_anchors = anchors.setdefault(block['ref_chr'], ([], [], [], []))
+            chr_anchors[0].extend(ref_anchors)
+            chr_anchors[1].extend(comp_anchors)
+            chr_anchors[2].extend([block_index] * len(ref_anchors))
+            chr_anchors[3].extend([len(ref_anchors) == 1] * len(ref_anchors))
+
+        # blocks don't overlap on the reference, so sorting by position only reorders whole blocks. Zero length
+        # blocks have a single anchor, which positions can only hit exactly, so they're kept apart from the blocks
+        # positions are interpolated in
+        self._chromosomes = {}
+        self._points = {}
+        for ref_chr, (ref_anchors, comp_anchors, block_indexes, single) in anchors.items():
+            ref_anchors = np.array(ref_anchors, dtype=np.int64)
+            comp_anchors = np.array(comp_anchors, dtype=np.float64)
+            block_indexes = np.array(block_indexes, dtype=np.int64)
+            single = np.array(single, dtype=bool)
+            for arrays, selected in ((self._chromosomes, ~single), (self._points, single)):
+                if selected.any():
+                    order = np.argsort(ref_anchors[selected], kind='mergesort')
+                    arrays[ref_chr] = (
+                        ref_anchors[selected][order],
+                        comp_anchors[selected][order],
+                        block_indexes[selected][order],
+                    )
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the index"""
+        return sum(array.nbytes for chromosomes in (self._chromosomes, self._points)
+                   for arrays in chromosomes.values() for array in arrays) + \
+            80 * len(self.block_ids)
+
+    def map_positions(self, ref_chr, positions):
+        """
+        Maps positions on one reference chromosome.
+
+        :param ref_chr:     the reference chromosome
+        :param positions:   a sequence of reference positions (base pairs)
+        :return: a (comparison positions, block indexes) tuple of arrays the same length as positions; positions
+                 that aren't inside any block get a block index of -1 (and a meaningless comparison position)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        comp_positions = np.zeros(len(positions), dtype=np.int64)
+        block_indexes = np.full(len(positions), -1, dtype=np.int64)
+
+        if len(positions) == 0:
+            return comp_positions, block_indexes
+
+        if ref_chr in self._chromosomes:
+            ref_anchors, comp_anchors, anchor_blocks = self._chromosomes[ref_chr]
+
+            # a position sitting exactly on the last anchor of a block is found by searching to the left, every other
+            # mapped position by searching to the right
+            for side in ('right', 'left'):
+                left = np.clip(np.searchsorted(ref_anchors, positions, side=side) - 1, 0, len(ref_anchors) - 2)
+                right = left + 1
+                found = \
+                    (block_indexes == -1) & \
+                    (ref_anchors[left] <= positions) & (positions <= ref_anchors[right]) & \
+                    (anchor_blocks[left] == anchor_blocks[right])
+
+                left, right = left[found], right[found]
+                fraction = (positions[found] - ref_anchors[left]) / (ref_anchors[right] - ref_anchors[left]).astype(
+                    np.float64)
+                comp_positions[found] = np.rint(
+                    comp_anchors[left] + fraction * (comp_anchors[right] - comp_anchors[left])).astype(np.int64)
+                block_indexes[found] = anchor_blocks[left]
+
+        if ref_chr in self._points:
+            point_positions, point_comp_positions, point_blocks = self._points[ref_chr]
+            hits = np.clip(np.searchsorted(point_positions, positions, side='left'), 0, len(point_positions) - 1)
+            found = (block_indexes == -1) & (point_positions[hits] == positions)
+            comp_positions[found] = point_comp_positions[hits[found]].astype(np.int64)
+            block_indexes[found] = point_blocks[hits[found]]
+
+        return comp_positions, block_indexes
+
+    def lift_positions(self, positions):
+        """
+        Maps a batch of positions.
+
+        :param positions: a list of dictionaries, each with a chr and a pos property
+        :return: a list of dictionaries (one per position, in order) with the input properties plus comp_chr,
+                 comp_pos and block_id, all of which are None for positions outside of the syntenic blocks
+        """
+        results = [dict(position) for position in positions]
+
+        for ref_chr, indexes in _group_by_chr(positions).items():
+            comp_positions, block_indexes = self.map_positions(ref_chr, [positions[i]['pos'] for i in indexes])
+            for i, comp_pos, block_index in zip(indexes, comp_positions.tolist(), block_indexes.tolist()):
+                results[i].update(self._mapping(block_index, comp_pos, 'comp_pos'))
+
+        return results
+
+    def lift_intervals(self, intervals):
+        """
+        Maps a batch of intervals by mapping both of their ends.
+
+        :param intervals: a list of dictionaries, each with a chr, a start and an end property
+        :return: a list of dictionaries (one per interval, in order) with the input properties plus comp_chr,
+                 comp_start and comp_end (sorted so that comp_start <= comp_end) and the start_block_id and
+                 end_block_id of the blocks each end fell in. The comparison properties are None unless both
+                 ends map onto the same comparison chromosome
+        """
+        results = [dict(interval) for interval in intervals]
+
+        for ref_chr, indexes in _group_by_chr(intervals).items():
+            comp_starts, start_blocks = self.map_positions(ref_chr, [intervals[i]['start'] for i in indexes])
+            comp_ends, end_blocks = self.map_positions(ref_chr, [intervals[i]['end'] for i in indexes])
+
+            for i, comp_start, start_block, comp_end, end_block in zip(
+                    indexes, comp_starts.tolist(), start_blocks.tolist(), comp_ends.tolist(), end_blocks.tolist()):
+                start_mapping = self._mapping(start_block, comp_start, 'comp_pos')
+                end_mapping = self._mapping(end_block, comp_end, 'comp_pos')
+
+                result = results[i]
+                result['start_block_id'] = start_mapping['block_id']
+                result['end_block_id'] = end_mapping['block_id']
+                if start_mapping['block_id'] is not None and end_mapping['block_id'] is not None and \
+                        start_mapping['comp_chr'] == end_mapping['comp_chr']:
+                    result['comp_chr'] = start_mapping['comp_chr']
+                    result['comp_start'] = min(comp_start, comp_end)
+                    result['comp_end'] = max(comp_start, comp_end)
+                else:
+                    result['comp_chr'] = result['comp_start'] = result['comp_end'] = None
+
+        return results
+
+    def _mapping(self, block_index, comp_pos, pos_key):
+        if block_index < 0:
+            return {'comp_chr': None, pos_key: None, 'block_id': None}
+        return {
+            'comp_chr': self.block_comp_chrs[block_index],
+            pos_key: comp_pos,
+            'block_id': self.block_ids[block_index],
+        }
+
+
+def _group_by_chr(items):
+    """Groups the indexes of a list of dictionaries by their chr property (as a string)"""
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(str(item['chr']), []).append(i)
+    return groups
+
+
+def get_liftover_index(ref_taxon, comp_taxon):
+    """
+    Returns the (lazily built) lift-over index for a reference/comparison genome pair. Indexes are kept in the
+    query cache, so they are rebuilt when the database changes.
+
+    :param ref_taxon:   the NCBI ID for the reference genome
+    :param comp_taxon:  the NCBI ID for the comparison genome
+    :return: a LiftoverIndex
+    """
+    key = ('liftover', str(ref_taxon), str(comp_taxon))
+    index = dba.query_cache.get(key)
+    if index is None:
+        index = LiftoverIndex(dba.get_blocks(ref_taxon, comp_taxon, include_anchors=True))
+        dba.query_cache.put(key, index, index.nbytes)
+    return index
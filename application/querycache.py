@@ -0,0 +1,104 @@
+"""
+A bounded, in-process LRU cache for encoded responses and other derived data.
+
+The database is never written to by the application, so most responses are pure functions of the request and of the
+database file. Cache keys include a fingerprint of that file, which means that replacing synteny.db makes every
+existing entry unreachable (they are then evicted as soon as the fingerprint change is noticed).
+
+Entries are expected to be compact (encoded response bodies rather than the rows they were built from), and the cache
+is bounded by their actual size in bytes, which callers give when they put them in.
+"""
+import threading
+from collections import OrderedDict
+
+
+class QueryCache(object):
+    """
+    LRU cache limited by the total size of the cached values.
+
+    :param fingerprint: a callable returning the current database fingerprint
+    :param max_bytes:   maximum size of all cached values together; values larger than this on their own are never
+                        cached and 0 disables the cache
+    """
+
+    def __init__(self, fingerprint, max_bytes=268435456):
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._fingerprint = None
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        """
+        :param key: a hashable key (the current fingerprint is added to it)
+        :return: the cached value or None
+        """
+        key = self._versioned(key)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries[key] = entry
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """
+        :param key: a hashable key (the current fingerprint is added to it)
+        :param value: the value to cache; it will be shared by everyone getting it so it must not be modified
+        :param size: the size of the value in bytes, e.g. the length of an encoded response body
+        """
+        if self.max_bytes <= 0 or size > self.max_bytes:
+            return
+
+        key = self._versioned(key)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        :return: a dictionary with the cache limits, usage and hit/miss counters
+        """
+        with self._lock:
+            return {
+                'fingerprint': self._fingerprint,
+                'max_bytes': self.max_bytes,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
+
+    def _versioned(self, key):
+        fingerprint = self.fingerprint()
+        if fingerprint != self._fingerprint:
+            # entries for another version of the database can never be hit again
+            with self._lock:
+                if fingerprint != self._fingerprint:
+                    self._entries.clear()
+                    self._bytes = 0
+                    self._fingerprint = fingerprint
+        return fingerprint, key
+
@@ -0,0 +1,48 @@
+"""
+The JSON encoding used by every route.
+
+Encoding dominates the CPU time of the large gene and block responses, so responses are encoded with orjson when it
+is installed and with the standard library json module (compact, which lets it use its C encoder) otherwise. The
+backend can be forced with the SYNTENY_JSON_BACKEND environment variable ('orjson' or 'json').
+"""
+import json
+import os
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(value):
+    encoded = json.dumps(value, separators=(',', ':'))
+    if not isinstance(encoded, bytes):
+        encoded = encoded.encode('utf-8')
+    return encoded
+
+
+def _orjson_dumps(value):
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+BACKENDS = {'json': (_json_dumps, json.loads)}
+if orjson is not None:
+    BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+
+BACKEND = os.environ.get('SYNTENY_JSON_BACKEND') or ('orjson' if orjson is not None else 'json')
+if BACKEND not in BACKENDS:
+    raise ValueError('unavailable JSON backend {0!r}, expected one of {1}'.format(BACKEND, sorted(BACKENDS)))
+
+# dumps returns the UTF-8 encoded JSON as bytes
+dumps, loads = BACKENDS[BACKEND]
+
+
+def json_response(value, status=200):
+    """
+    :param value:   the JSON serializable response content
+    :param status:  the response status code
+    :return: an application/json response
+    """
+    return Response(dumps(value), status=status, mimetype='application/json')
@@ -0,0 +1,220 @@
+"""
+Production entry point: a preforking, multi-process WSGI server.
+
+    python -m application.serve --workers 4 --port 5001 --warm
+
+The master process binds the listening socket and forks the workers, which all accept connections on it, so every core
+serves requests. SQLite connections can't be shared across a fork, so each worker opens its own read-only connections
+once it's running. With --warm the master caches the encoded species, genome wide block and chromosome gene, block and
+QTL responses before forking, so every worker, including the ones that replace recycled workers, starts with warm caches
+rather than paying for cold queries on its first requests.
+
+Workers are recycled gracefully: a worker exits after finishing its --max-requests-th request and the master forks a
+replacement. SIGHUP recycles every worker the same way and SIGTERM (or SIGINT) stops the server once the workers have
+finished their current requests. Connections arriving meanwhile wait in the listen backlog rather than being refused.
+"""
+import argparse
+import errno
+import os
+import random
+import signal
+import socket
+
+from werkzeug.serving import make_server
+
+from application import app
+from application import sqliteaccess as dba
+
+
+# seconds a worker waits for a connection before checking whether it has been asked to stop
+WORKER_POLL_INTERVAL = 1.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="run the synteny browser with a preforking multi-process server")
+    parser.add_argument(
+        '--host', default='0.0.0.0',
+        help="the address to listen on (default: 0.0.0.0)")
+    parser.add_argument(
+        '-p', '--port', type=int, default=5001,
+        help="the port to listen on (default: 5001)")
+    parser.add_argument(
+        '-w', '--workers', type=int, default=_cpu_count(),
+        help="the number of worker processes (default: the number of CPUs)")
+    parser.add_argument(
+        '--max-requests', type=int, default=0,
+        help="recycle a worker after it has served about this many requests; 0 never recycles (default: 0)")
+    parser.add_argument(
+        '--backlog', type=int, default=128,
+        help="the maximum number of connections waiting to be accepted (default: 128)")
+    parser.add_argument(
+        '--warm', action='store_true',
+        help="fill the query cache before the workers start accepting requests")
+    args = parser.parse_args()
+    return args
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+def warm_caches():
+    """
+    Requests the species, whole genome and whole chromosome routes so that their encoded responses are cached.
+
+    :return: the number of responses cached
+    """
+    client = app.test_client()
+    paths = ['/species']
+
+    taxon_pairs = dba.get_taxon_pairs()
+    if taxon_pairs is None:
+        ref_taxonids = [s['ref_taxonid'] for s in dba.get_species()]
+        taxon_pairs = [
+            {'ref_taxonid': ref_taxonid, 'comp_taxonid': comp_taxonid}
+            for ref_taxonid in ref_taxonids for comp_taxonid in ref_taxonids if ref_taxonid != comp_taxonid
+        ]
+
+    for pair in taxon_pairs:
+        ref_taxonid, comp_taxonid = pair['ref_taxonid'], pair['comp_taxonid']
+        paths.append('/syntenic-blocks/{0}/{1}'.format(ref_taxonid, comp_taxonid))
+        paths.append('/syntenic-blocks/{0}/{1}/blocks.json'.format(ref_taxonid, comp_taxonid))
+
+        ref_chrs = []
+        for block in dba.get_genome_blocks(ref_taxonid, comp_taxonid):
+            if block['ref_chr'] not in ref_chrs:
+                ref_chrs.append(block['ref_chr'])
+        for ref_chr in ref_chrs:
+            paths.append('/syntenic-blocks/{0}/{1}/{2}-blocks.json'.format(ref_taxonid, comp_taxonid, ref_chr))
+            paths.append('/syntenic-blocks/{0}/{1}/{2}'.format(ref_taxonid, comp_taxonid, ref_chr))
+            paths.append('/chr-genes/{0}/{1}/{2}'.format(ref_taxonid, comp_taxonid, ref_chr))
+            paths.append('/chr-qtls/{0}/{1}'.format(ref_taxonid, ref_chr))
+    dba.release_db_connection()
+
+    for path in paths:
+        # reading the body is what caches a streamed response
+        client.get(path).get_data()
+
+    return len(paths)
+
+
+def _listen(host, port, backlog):
+    """Binds the socket shared by all the workers"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(sock, host, max_requests):
+    """
+    Serves requests on the shared socket until the worker is asked to stop or has served max_requests requests.
+
+    :param sock: the listening socket
+    :param host: the address the socket is bound to
+    :param max_requests: the number of requests after which the worker exits, 0 for no limit
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server = make_server(host, 0, app, fd=sock.fileno())
+    server.timeout = WORKER_POLL_INTERVAL
+
+    # handle_request calls handle_timeout when no connection arrived in time
+    timed_out = []
+    server.handle_timeout = lambda: timed_out.append(True)
+
+    served = 0
+    while not stopping and (not max_requests or served < max_requests):
+        del timed_out[:]
+        server.handle_request()
+        if not timed_out:
+            served += 1
+
+
+def _spawn_worker(sock, host, max_requests):
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(sock, host, max_requests)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            status = 1
+        finally:
+            os._exit(status)
+    return pid
+
+
+def main():
+    args = parse_args()
+
+    sock = _listen(args.host, args.port, args.backlog)
+    print('Listening on {0}:{1} with {2} workers'.format(args.host, args.port, args.workers))
+
+    if args.warm:
+        responses = warm_caches()
+        print('Warmed the query cache with {0} responses'.format(responses))
+    # map the genome index (if there is one) before forking so that the workers share the mapping; they must not
+    # inherit the master's connections though
+    dba.get_genome_index()
+    dba.close_db_connections()
+
+    def max_requests():
+        # spread the limits out a little so that the workers don't all recycle at the same time
+        if not args.max_requests:
+            return 0
+        return args.max_requests + random.randint(0, args.max_requests // 10)
+
+    workers = set()
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in list(workers):
+            _kill(pid)
+
+    def recycle(signum, frame):
+        for pid in list(workers):
+            _kill(pid)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, recycle)
+
+    for _ in range(args.workers):
+        workers.add(_spawn_worker(sock, args.host, max_requests()))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        workers.discard(pid)
+        if not stopping:
+            workers.add(_spawn_worker(sock, args.host, max_requests()))
+
+    sock.close()
+
+
+def _kill(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    main()
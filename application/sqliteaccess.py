@@ -1,11 +1,216 @@
+import json
 import os
 import pprint
-import sqlite3
+import struct
+import threading
 from itertools import chain
 
+from application.dbpool import ConnectionPool
+from application.genomeindex import GenomeIndex
+from application.querycache import QueryCache
+
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
-DB_PATH = os.path.join(SCRIPT_DIR, '..', 'synteny.db')
+DB_PATH = os.environ.get('SYNTENY_DB', os.path.join(SCRIPT_DIR, '..', 'synteny.db'))
+
+# every query function below shares these read-only connections; the PRAGMAs can be tuned through the
+# environment without touching the code
+_pool = ConnectionPool(
+    DB_PATH,
+    max_idle=int(os.environ.get('SYNTENY_DB_POOL_SIZE', 8)),
+    mmap_size=int(os.environ.get('SYNTENY_DB_MMAP_SIZE', 268435456)),
+    cache_size=int(os.environ.get('SYNTENY_DB_CACHE_SIZE', -16384)),
+    temp_store=os.environ.get('SYNTENY_DB_TEMP_STORE', 'MEMORY'),
+)
+
+
+_db_state = {'stat': None, 'fingerprint': None, 'build_info': None, 'metadata': None, 'genome_index': None,
+             'materialized': None}
+_db_state_lock = threading.Lock()
+
+
+def get_db_fingerprint():
+    """
+    Identifies the current version of the database file from its inode, size and modification time. Whenever it
+    changes (i.e. the database has been replaced) the connection pool is reset and everything remembered about the
+    old file is forgotten.
+
+    :return: a fingerprint string
+    """
+    st = os.stat(DB_PATH)
+    stat = (st.st_ino, st.st_size, st.st_mtime)
+    if stat != _db_state['stat']:
+        with _db_state_lock:
+            if stat != _db_state['stat']:
+                if _db_state['stat'] is not None:
+                    _pool.reset()
+                _known_tables.clear()
+                _db_state['build_info'] = None
+                _db_state['metadata'] = None
+                _db_state['genome_index'] = None
+                _db_state['materialized'] = None
+                _db_state['fingerprint'] = '{0:x}-{1:x}-{2:x}'.format(st.st_ino, st.st_size, int(st.st_mtime * 1e6))
+                _db_state['stat'] = stat
+    return _db_state['fingerprint']
+
+
+# encoded responses (see jsonAPI.cached_response) and lift-over indexes are kept in memory until the database changes
+query_cache = QueryCache(
+    get_db_fingerprint,
+    max_bytes=int(os.environ.get('SYNTENY_CACHE_MAX_BYTES', 268435456)),
+)
+
+
+def _get_db_connection():
+    """Returns the pooled, read-only connection bound to the current thread"""
+    get_db_fingerprint()
+    return _pool.connection()
+
+
+def release_db_connection():
+    """Hands the current thread's connection back to the pool; called when a request is finished"""
+    _pool.release()
+
+
+def close_db_connections():
+    """
+    Closes the current thread's connection and every pooled one, e.g. before forking worker processes, which must
+    open connections of their own.
+    """
+    _pool.release()
+    _pool.reset()
+
+
+def get_pool_stats():
+    """
+    :return: a dictionary of connection pool counters (connections opened, reused, in use, idle, ...)
+    """
+    return _pool.stats()
+
+
+def get_cache_stats():
+    """
+    :return: a dictionary of query cache counters (entries, bytes, hits, misses, evictions, ...)
+    """
+    return query_cache.stats()
+
+
+def get_build_info():
+    """
+    Identifies the build of the database, as recorded by db-creation/build_metadata.py. The build is only read once
+    per version of the database file, so this doesn't normally touch SQLite. Databases built without the build_info
+    table are identified by their file fingerprint and modification time instead.
+
+    :return: a dictionary with the build_id string and built_at time (seconds since the epoch) of the database
+    """
+    get_db_fingerprint()
+    build_info = _db_state['build_info']
+    if build_info is None:
+        db_con = _get_db_connection()
+        row = None
+        if _table_exists(db_con, 'build_info'):
+            c = db_con.cursor()
+            c.execute('SELECT build_id, built_at FROM build_info')
+            row = c.fetchone()
+
+        if row is not None:
+            build_info = {'build_id': row[0], 'built_at': row[1]}
+        else:
+            build_info = {'build_id': _db_state['fingerprint'], 'built_at': int(_db_state['stat'][2])}
+        _db_state['build_info'] = build_info
+    return build_info
+
+
+def _get_metadata():
+    """
+    Reads the species and taxon_pair tables recorded by db-creation/build_metadata.py, once per version of the
+    database file.
+
+    :return: a dictionary with the species and taxon_pairs lists, either of which is None if the database was built
+             without its table
+    """
+    get_db_fingerprint()
+    metadata = _db_state['metadata']
+    if metadata is None:
+        db_con = _get_db_connection()
+        c = db_con.cursor()
+        metadata = {'species': None, 'taxon_pairs': None}
+
+        if _table_exists(db_con, 'species'):
+            c.execute('''
+                SELECT taxon_id, name, name_alias, display_order, chromosomes, data_layers
+                FROM species
+                ORDER BY display_order
+            ''')
+            metadata['species'] = []
+            for row in c:
+                row_dict = _dictify_row(c, row)
+                row_dict['chromosomes'] = json.loads(row_dict['chromosomes'])
+                row_dict['data_layers'] = json.loads(row_dict['data_layers'])
+                metadata['species'].append(row_dict)
+
+        if _table_exists(db_con, 'taxon_pair'):
+            c.execute('''
+                SELECT ref_taxonid, comp_taxonid, block_count, homolog_count
+                FROM taxon_pair
+                ORDER BY ref_taxonid, comp_taxonid
+            ''')
+            metadata['taxon_pairs'] = [_dictify_row(c, row) for row in c]
+
+        _db_state['metadata'] = metadata
+    return metadata
+
+
+def get_species_metadata():
+    """
+    Gets the configured species of the database. This doesn't normally touch SQLite (see _get_metadata).
+
+    :return: a list of dictionaries in display order, each with the taxon_id, name, name_alias and display_order of
+             a species, its chromosomes (a list of {"chr": ..., "size": ...}) and its data_layers (e.g. ["genes",
+             "qtls", "GO", "MP"]), or None if the database was built without the species table
+    """
+    return _get_metadata()['species']
+
+
+def get_taxon_pairs():
+    """
+    Gets the pairs of reference and comparison species that have syntenic blocks. This doesn't normally touch SQLite
+    (see _get_metadata).
+
+    :return: a list of dictionaries with the ref_taxonid, comp_taxonid, block_count and homolog_count of a pair,
+             ordered by reference and comparison species, or None if the database was built without the taxon_pair
+             table
+    """
+    return _get_metadata()['taxon_pairs']
+
+
+def get_genome_index():
+    """
+    Opens the memory-mapped genome index exported by db-creation/build_genome_index.py, once per version of the
+    database file. The index is only used if its id matches the one recorded in the database, so an index left over
+    from another build of the database is ignored.
+
+    :return: a GenomeIndex, or None if the database has no (matching) index
+    """
+    get_db_fingerprint()
+    genome_index = _db_state['genome_index']
+    if genome_index is None:
+        genome_index = False
+        db_con = _get_db_connection()
+        if _table_exists(db_con, 'genome_index'):
+            c = db_con.cursor()
+            c.execute('SELECT index_id, file_name FROM genome_index')
+            row = c.fetchone()
+            if row is not None:
+                try:
+                    index = GenomeIndex(os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), row[1]))
+                except (IOError, OSError, ValueError):
+                    index = None
+                if index is not None and index.index_id == row[0]:
+                    genome_index = index
+        _db_state['genome_index'] = genome_index
+    return genome_index or None
+
 
 def count_ont_children(ont_id, ont_term):
     """
@@ -14,23 +219,53 @@ def count_ont_children(ont_id, ont_term):
     :param ont_term:
     :return:
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
-    query_vars = (ont_id + ":%",
-                  "%" + ont_term + "%",
-                  "%" + ont_term + "%",)
+    query_vars = _ont_term_params(ont_term)
+    query_vars['ont_id'] = ont_id + ":%"
 
     c.execute('''
-        SELECT SUM(count) 
-            FROM on_terms 
-            WHERE id LIKE ? 
-              AND (id LIKE ? OR name LIKE ?)
-              AND count IS NOT NULL; 
-    ''', query_vars)
+        SELECT SUM(count)
+            FROM on_terms AS ot
+            WHERE ot.id LIKE :ont_id
+              AND {0}
+              AND count IS NOT NULL;
+    '''.format(_ont_term_filter(db_con, ont_term)), query_vars)
 
     return c.fetchone()[0]
 
+
+def _ont_term_params(ont_term):
+    """Query parameters used by the condition returned from _ont_term_filter"""
+    return {
+        'ont_term': "%" + ont_term + "%",
+        'ont_match': '{id name}: ' + _fts_string(ont_term),
+    }
+
+
+def _ont_term_filter(db_con, ont_term):
+    """
+    Builds a WHERE condition selecting the ontology terms (on_terms AS ot) whose id or name contains ont_term (see
+    _ont_term_params). If the trigram index (see db-creation/import_ontology.py) is available, the matching terms are
+    looked up in it, otherwise the condition falls back to scanning on_terms with LIKE. The index can't look up
+    strings shorter than three characters or honour the LIKE wildcards, so those are always scanned for.
+
+    :param db_con:      the database connection the condition will be used with
+    :param ont_term:    the searched substring
+    :return: an SQL condition string
+    """
+    if len(ont_term) >= 3 and '%' not in ont_term and '_' not in ont_term and \
+            _table_exists(db_con, 'on_terms_search'):
+        return '''
+            ot.id IN (SELECT id FROM on_terms_search WHERE on_terms_search MATCH :ont_match)
+        '''
+
+    return '''
+        (ot.id LIKE :ont_term OR ot.name LIKE :ont_term)
+    '''
+
+
 # type-ahead and autocomplete related functions
 def get_gene_symbols(taxon_id):
     """
@@ -39,7 +274,7 @@ def get_gene_symbols(taxon_id):
     :param taxon_id: species id
     :return: an iterable dictionary of the gene symbols
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute('''
@@ -60,7 +295,7 @@ def get_qtl_symbols(taxon_id):
     :param taxon_id: species id
     :return: an iterable dictionary of QTL symbols
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute('''
@@ -81,7 +316,7 @@ def get_ont_terms(ont_id):
     :param ont_id:
     :return:
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     symbol = (ont_id + ":%",)
@@ -103,7 +338,7 @@ def get_ont_ids(ont_id):
     :param
     :return:
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute('''
@@ -130,11 +365,195 @@ def get_ont_terms_ids(ont_id):
         yield item
 
 
+def get_autocomplete_terms(search_cat, search_id, prefix, limit=20):
+    """
+    Get the best suggestions for a partially typed search term. Exact matches come first, followed by terms
+    starting with the prefix and then terms with a word starting with it, shorter terms ranking higher.
+
+    :param search_cat: search category, one among {gene, qtl, ont}
+    :param search_id: the taxon id for gene and qtl searches, the ontology id (i.e. "GO, DO, MP, ...) for ont
+    :param prefix: the partially typed term
+    :param limit: the maximum number of suggestions to return
+    :return: an iterable of dictionaries with the suggested term
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+
+    params = {'prefix': prefix, 'limit': limit}
+    ranking = '''
+        ORDER BY lower(term) = lower(:prefix) DESC,
+            substr(lower(term), 1, length(:prefix)) = lower(:prefix) DESC,
+            length(term),
+            term
+        LIMIT :limit
+    '''
+
+    if _table_exists(db_con, 'autocomplete_term'):
+        params['match'] = 'category:{0} AND scope:{1} AND term:{2}*'.format(
+            _fts_string(search_cat), _fts_string(search_id), _fts_string(prefix))
+        c.execute('''
+            SELECT term FROM autocomplete_term
+            WHERE autocomplete_term MATCH :match
+        ''' + ranking, params)
+    else:
+        # databases built without db-creation/build_search_index.py only get plain prefix matching
+        params['search_id'] = search_id
+        params['pattern'] = prefix.replace('%', '').replace('_', '') + '%'
+        if search_cat == 'gene':
+            candidates = '''
+                SELECT DISTINCT gene_symbol AS term FROM gene
+                WHERE gene_taxonid = :search_id AND gene_symbol LIKE :pattern
+            '''
+        elif search_cat == 'qtl':
+            candidates = '''
+                SELECT DISTINCT name AS term FROM feature
+                WHERE type = 'QTL' AND taxon_id = :search_id AND name LIKE :pattern
+            '''
+        elif search_cat == 'ont':
+            params['ont_id'] = search_id + ':%'
+            candidates = '''
+                SELECT name AS term FROM on_terms WHERE id LIKE :ont_id AND name LIKE :pattern
+                UNION
+                SELECT id AS term FROM on_terms WHERE id LIKE :ont_id AND id LIKE :pattern
+            '''
+        else:
+            return
+
+        c.execute('SELECT DISTINCT term FROM (' + candidates + ')' + ranking, params)
+
+    for row in c:
+        yield _dictify_row(c, row)
+
+
+def _fts_string(value):
+    """Quotes a value for use as a string in an FTS5 query expression"""
+    return '"' + value.replace('"', '""') + '"'
+
+
 def _dictify_row(cursor, row):
     """Turns the given row into a dictionary where the keys are the column names"""
     return {col[0]: row[i] for i, col in enumerate(cursor.description)}
 
 
+# number of rows read at a time by _column_batches
+COLUMN_BATCH_SIZE = 65536
+
+
+def _column_batches(cursor, column_types, batch_size=COLUMN_BATCH_SIZE):
+    """
+    Reads the rows of an executed cursor a batch at a time, transposing every batch into columns. The binary response
+    formats are built from columns, so this saves building a dictionary per row.
+
+    :param cursor:          the executed cursor
+    :param column_types:    the declared SQL type ('TEXT', 'INTEGER' or 'REAL') of every column, by column name, so
+                            that typed formats don't have to guess it from values that may all be NULL
+    :param batch_size:      the maximum number of rows per batch
+    :return: a generator of (column names, column types, columns) tuples where every column is a list of values; a
+             query without any result gives a single batch of empty columns
+    """
+    names = [col[0] for col in cursor.description]
+    types = [column_types[name] for name in names]
+    empty = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        empty = False
+        yield names, types, [list(column) for column in zip(*rows)]
+
+    if empty:
+        yield names, types, [[] for _ in names]
+
+
+_known_tables = {}
+
+
+def _table_exists(db_con, table):
+    """
+    Checks whether the database has the given table. Derived tables (indexes, precomputed data, ...) are built by
+    optional db-creation steps, so query functions use this to fall back to the base tables when they're missing.
+    """
+    if table not in _known_tables:
+        c = db_con.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        _known_tables[table] = c.fetchone() is not None
+    return _known_tables[table]
+
+
+def _region_params(taxon_id, chromosome, start, end):
+    """Query parameters used by the condition returned from _region_filter"""
+    return {
+        'region_taxonid': taxon_id,
+        'region_chr': chromosome,
+        'region_start': start,
+        'region_end': end,
+    }
+
+
+# the genome index is only used for regions overlapping at most this many rows, whose rowids are bound as parameters;
+# larger (zoomed out) regions are left to the R*Tree, or to the table's own columns
+GENOME_INDEX_MAX_ROWIDS = 512
+# ... and for regions needing at most this many of the index's rows scanned (see genomeindex for when that's more than
+# the rows overlapping the region)
+GENOME_INDEX_MAX_SCAN = 65536
+
+
+def _region_filter(db_con, table, taxon_col, chr_col, start_col, end_col, params, scope=''):
+    """
+    Builds a WHERE condition selecting the rows of table that overlap a genomic region (see _region_params). If the
+    memory-mapped genome index (see get_genome_index) covers the table and the region is small enough (see
+    GENOME_INDEX_MAX_ROWIDS), the overlapping rowids are looked up in it and bound as parameters; otherwise, if the
+    table's R*Tree (see db-creation/build_interval_index.py) is available, they are looked up in that, and failing both
+    the condition compares the table's own columns.
+
+    :param db_con:      the database connection the condition will be used with
+    :param table:       the table being filtered (gene, feature, syntenic_block or homolog)
+    :param taxon_col:   the table's taxon id column
+    :param chr_col:     the table's chromosome column
+    :param start_col:   the table's start position column
+    :param end_col:     the table's end position column
+    :param params:      the query parameters, including the _region_params of the region; the parameters the
+                        condition needs on top of those are added to it
+    :param scope:       the comparison taxon the rows are limited to for homologs, '' otherwise; the condition for
+                        homologs doesn't include it, so the query must still filter on the comparison taxon
+    :return: an SQL condition string
+    """
+    genome_index = get_genome_index()
+    if genome_index is not None:
+        rowids = genome_index.overlapping(
+            table, params['region_taxonid'], params['region_chr'], params['region_start'], params['region_end'],
+            scope, GENOME_INDEX_MAX_SCAN)
+        if rowids is not None and len(rowids) == 0:
+            return '0'
+        if rowids is not None and len(rowids) <= GENOME_INDEX_MAX_ROWIDS:
+            # the list is padded to a power of two (repeating the last rowid) so that there are only a few shapes of
+            # each statement for the statement cache to hold
+            rowids = rowids.tolist()
+            slots = 8
+            while slots < len(rowids):
+                slots *= 2
+            names = []
+            for i in range(slots):
+                name = 'region_rowid{0}'.format(i)
+                params[name] = rowids[min(i, len(rowids) - 1)]
+                names.append(':' + name)
+            return 'rowid IN ({0})'.format(','.join(names))
+
+    if _table_exists(db_con, table + '_rtree'):
+        return '''
+            rowid IN (
+                SELECT id FROM {0}_rtree
+                WHERE seq_min <= (SELECT seq_key FROM interval_seq WHERE taxon_id=:region_taxonid AND chr=:region_chr)
+                  AND seq_max >= (SELECT seq_key FROM interval_seq WHERE taxon_id=:region_taxonid AND chr=:region_chr)
+                  AND start_pos <= :region_end AND end_pos >= :region_start
+            )
+        '''.format(table)
+
+    return '''
+        {0}=:region_taxonid AND {1}=:region_chr AND {2} <= :region_end AND {3} >= :region_start
+    '''.format(taxon_col, chr_col, start_col, end_col)
+
+
 def get_blocks(ref_taxon, comp_taxon, include_anchors=False, ref_chr=None):
     """
     Get syntenic blocks between the given reference and comparison genomes
@@ -168,7 +587,13 @@ def get_blocks(ref_taxon, comp_taxon, include_anchors=False, ref_chr=None):
                             orientation or not
     """
 
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
+
+    if include_anchors and _table_exists(db_con, 'syntenic_block_anchor'):
+        for block in _get_precomputed_anchor_blocks(db_con, ref_taxon, comp_taxon, ref_chr):
+            yield block
+        return
+
     c = db_con.cursor()
 
     if ref_chr is None:
@@ -271,6 +696,286 @@ def get_blocks(ref_taxon, comp_taxon, include_anchors=False, ref_chr=None):
             yield _dictify_row(c, row)
 
 
+def _get_precomputed_anchor_blocks(db_con, ref_taxon, comp_taxon, ref_chr=None):
+    """
+    Reads blocks along with the anchor points computed by db-creation/build_anchor_points.py
+    :param db_con:      the database connection
+    :param ref_taxon:   the NCBI ID for the reference genome
+    :param comp_taxon:  the NCBI ID for the comparison genome
+    :param ref_chr:     the reference chromosome (None indicates all chromosomes)
+    :return: an iterable of block dictionaries as described in get_blocks
+    """
+    c = db_con.cursor()
+
+    chr_filter = '' if ref_chr is None else 'AND syntenic_block.ref_chr=:ref_chr'
+    c.execute('''
+        SELECT syntenic_block.*,
+            anchor.match_ref_anchor_points,
+            anchor.match_comp_anchor_points,
+            anchor.true_ref_anchor_points,
+            anchor.true_comp_anchor_points
+        FROM syntenic_block
+        INNER JOIN syntenic_block_anchor AS anchor
+            ON anchor.ref_taxonid = syntenic_block.ref_taxonid
+            AND anchor.comp_taxonid = syntenic_block.comp_taxonid
+            AND anchor.ref_chr = syntenic_block.ref_chr
+            AND anchor.ref_start_pos = syntenic_block.ref_start_pos
+        WHERE syntenic_block.ref_taxonid=:ref_taxonid AND syntenic_block.comp_taxonid=:comp_taxonid {0}
+        ORDER BY syntenic_block.ref_chr, syntenic_block.ref_start_pos
+    '''.format(chr_filter), {
+        'ref_taxonid': ref_taxon,
+        'comp_taxonid': comp_taxon,
+        'ref_chr': ref_chr,
+    })
+
+    for row in c:
+        curr_block = _dictify_row(c, row)
+        for anchor_type in ('match', 'true'):
+            curr_block[anchor_type + '_anchor_points'] = {
+                'ref_anchor_points': _unpack_positions(curr_block.pop(anchor_type + '_ref_anchor_points')),
+                'comp_anchor_points': _unpack_positions(curr_block.pop(anchor_type + '_comp_anchor_points')),
+            }
+        yield curr_block
+
+
+def _unpack_positions(blob):
+    """Unpacks an array of little-endian 32-bit positions stored by the db-creation scripts"""
+    return struct.unpack('<{0}i'.format(len(blob) // 4), blob)
+
+
+def get_region_bin_summaries(ref_taxonid, comp_taxonid, ref_chr, start, end, bin_count):
+    """
+    Summarizes a reference coordinate range split into bins of equal size, for views too zoomed out to draw
+    individual genes
+    :param ref_taxonid:     the NCBI taxonomy ID string for the reference
+    :param comp_taxonid:    the NCBI taxonomy ID string for the comparison
+    :param ref_chr:         the chromosome for the reference coordinate range
+    :param start:           the start position (base pairs) of the reference coordinate range
+    :param end:             the end position (base pairs) of the reference coordinate range
+    :param bin_count:       the (maximum) number of bins; bins are never smaller than one base
+    :return: a (bin size, bins) tuple where bins is a list of dictionaries (one per bin, in order). Each dictionary
+             will contain the following attributes:
+
+    * start:            the start position (base pairs) of the bin
+    * end:              the end position (base pairs) of the bin
+    * gene_count:       the number of reference genes overlapping the bin
+    * homolog_count:    the number of homologs in the comparison genome of the genes overlapping the bin
+    * covered_bases:    the number of bases of the bin within at least one gene
+    * dominant_block:   the id of the syntenic block covering most of the bin, None if no block overlaps it
+    """
+    bin_size = max(-(-(end - start + 1) // bin_count), 1)
+    bins = [
+        {
+            'start': bin_start,
+            'end': min(bin_start + bin_size - 1, end),
+            'gene_count': 0,
+            'homolog_count': 0,
+            'covered_bases': 0,
+            'dominant_block': None,
+        } for bin_start in range(start, end + 1, bin_size)
+    ]
+
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+    params = _region_params(ref_taxonid, ref_chr, start, end)
+    params['comp_taxonid'] = comp_taxonid
+
+    c.execute(
+        """
+        SELECT gene_start_pos, gene_end_pos
+        FROM gene
+        WHERE {0}
+        ORDER BY gene_start_pos
+        """.format(_region_filter(db_con, 'gene', 'gene_taxonid', 'gene_chr', 'gene_start_pos', 'gene_end_pos',
+                                  params)),
+        params
+    )
+
+    # overlapping genes are merged so that their shared bases are only counted as covered once
+    covered_start = covered_end = None
+    for gene_start, gene_end in c:
+        for i, _ in _bin_overlaps(start, end, bin_size, gene_start, gene_end):
+            bins[i]['gene_count'] += 1
+
+        if covered_end is not None and gene_start <= covered_end + 1:
+            covered_end = max(covered_end, gene_end)
+            continue
+        if covered_end is not None:
+            for i, overlap in _bin_overlaps(start, end, bin_size, covered_start, covered_end):
+                bins[i]['covered_bases'] += overlap
+        covered_start, covered_end = gene_start, gene_end
+    if covered_end is not None:
+        for i, overlap in _bin_overlaps(start, end, bin_size, covered_start, covered_end):
+            bins[i]['covered_bases'] += overlap
+
+    c.execute(
+        """
+        SELECT ref_start, ref_end
+        FROM homolog
+        WHERE comp_taxon_id=:comp_taxonid AND {0}
+        """.format(_region_filter(db_con, 'homolog', 'ref_taxon_id', 'ref_seq_id', 'ref_start', 'ref_end', params,
+                                  comp_taxonid)),
+        params
+    )
+    for homolog_start, homolog_end in c:
+        for i, _ in _bin_overlaps(start, end, bin_size, homolog_start, homolog_end):
+            bins[i]['homolog_count'] += 1
+
+    c.execute(
+        """
+        SELECT symbol, ref_start_pos, ref_end_pos
+        FROM syntenic_block
+        WHERE comp_taxonid=:comp_taxonid AND {0}
+        """.format(_region_filter(db_con, 'syntenic_block', 'ref_taxonid', 'ref_chr', 'ref_start_pos', 'ref_end_pos',
+                                  params)),
+        params
+    )
+    dominant_overlaps = [0] * len(bins)
+    for symbol, block_start, block_end in c:
+        for i, overlap in _bin_overlaps(start, end, bin_size, block_start, block_end):
+            if overlap > dominant_overlaps[i]:
+                dominant_overlaps[i] = overlap
+                bins[i]['dominant_block'] = symbol
+
+    return bin_size, bins
+
+
+def _bin_overlaps(start, end, bin_size, feature_start, feature_end):
+    """
+    Splits a feature over the bins of the range start-end
+    :return: a generator of (bin index, number of the feature's bases in the bin) tuples
+    """
+    feature_start = max(feature_start, start)
+    feature_end = min(feature_end, end)
+    if feature_start > feature_end:
+        return
+
+    for i in range((feature_start - start) // bin_size, (feature_end - start) // bin_size + 1):
+        bin_start = start + i * bin_size
+        bin_end = bin_start + bin_size - 1
+        yield i, min(feature_end, bin_end) - max(feature_start, bin_start) + 1
+
+
+# the bin sizes of the density histograms built by db-creation/build_density_pyramids.py
+DENSITY_BIN_SIZES = (10000, 100000, 1000000, 10000000)
+
+# the kinds of features counted in the density histograms; the scope of homologs is the comparison taxon, the scope of
+# ontology annotated genes (ont) is the ontology abbreviation (GO, MP, ...)
+DENSITY_FEATURES = ('gene', 'qtl', 'homolog', 'ont')
+
+
+def get_region_density(taxon_id, chromosome, start, end, feature, scope='', max_bins=1000):
+    """
+    Gets the number of features overlapping the bins of a coordinate range, at the finest of the DENSITY_BIN_SIZES
+    that needs at most max_bins bins (or the coarsest one). Bins are aligned to the chromosome: bin i covers the bases
+    i * bin_size + 1 to (i + 1) * bin_size. The counts are read from the density_pyramid table, so this takes the same
+    time however many features the range holds; without the table they are counted from the features instead.
+    :param taxon_id:    the NCBI taxonomy ID string of the genome
+    :param chromosome:  the chromosome for the coordinate range
+    :param start:       the start position (base pairs) of the coordinate range
+    :param end:         the end position (base pairs) of the coordinate range
+    :param feature:     the kind of feature to count, one of DENSITY_FEATURES
+    :param scope:       the comparison taxon for homologs, the ontology abbreviation for ont, '' otherwise
+    :param max_bins:    the maximum number of bins wanted
+    :return: a (bin size, bins) tuple where bins is a list of dictionaries (one per bin, in order) with the start
+             and end positions (base pairs) of the bin and the count of features overlapping it
+    """
+    bin_size = DENSITY_BIN_SIZES[-1]
+    for size in DENSITY_BIN_SIZES:
+        if (end - 1) // size - (start - 1) // size + 1 <= max_bins:
+            bin_size = size
+            break
+    # there are no bins before the first base of the chromosome
+    first_bin = max((start - 1) // bin_size, 0)
+    bin_count = max((end - 1) // bin_size - first_bin + 1, 0)
+
+    db_con = _get_db_connection()
+    if _table_exists(db_con, 'density_pyramid'):
+        counts = _read_density_counts(db_con, taxon_id, chromosome, feature, scope, bin_size, first_bin, bin_count)
+    else:
+        counts = _count_density(db_con, taxon_id, chromosome, feature, scope, bin_size, first_bin, bin_count)
+
+    return bin_size, [
+        {
+            'start': (first_bin + i) * bin_size + 1,
+            'end': (first_bin + i + 1) * bin_size,
+            'count': count,
+        } for i, count in enumerate(counts)
+    ]
+
+
+def _read_density_counts(db_con, taxon_id, chromosome, feature, scope, bin_size, first_bin, bin_count):
+    """Reads bin_count counts starting at first_bin from a density histogram, reading only that part of the blob"""
+    c = db_con.cursor()
+    c.execute(
+        """
+        SELECT substr(counts, :offset, :length)
+        FROM density_pyramid
+        WHERE taxon_id=:taxonid AND chr=:chr AND feature=:feature AND scope=:scope AND bin_size=:bin_size
+        """, {
+            'offset': first_bin * 4 + 1,
+            'length': bin_count * 4,
+            'taxonid': taxon_id,
+            'chr': chromosome,
+            'feature': feature,
+            'scope': scope,
+            'bin_size': bin_size,
+        }
+    )
+    row = c.fetchone()
+
+    counts = []
+    if row is not None and row[0] is not None:
+        blob = bytes(row[0])
+        whole = len(blob) // 4
+        counts = list(struct.unpack('<%dI' % whole, blob[:whole * 4]))
+
+    # histograms end with the last bin holding a feature
+    return counts + [0] * (bin_count - len(counts))
+
+
+def _count_density(db_con, taxon_id, chromosome, feature, scope, bin_size, first_bin, bin_count):
+    """Counts the features overlapping bin_count bins starting at first_bin, for databases without density_pyramid"""
+    start = first_bin * bin_size + 1
+    end = (first_bin + bin_count) * bin_size
+    params = _region_params(taxon_id, chromosome, start, end)
+    params['scope'] = scope
+
+    if feature == 'gene':
+        query = """
+            SELECT gene_start_pos, gene_end_pos FROM gene WHERE {0}
+        """.format(_region_filter(db_con, 'gene', 'gene_taxonid', 'gene_chr', 'gene_start_pos', 'gene_end_pos', params))
+    elif feature == 'qtl':
+        query = """
+            SELECT start, `end` FROM feature WHERE type = 'QTL' AND {0}
+        """.format(_region_filter(db_con, 'feature', 'taxon_id', 'seq_id', 'start', '`end`', params))
+    elif feature == 'homolog':
+        query = """
+            SELECT ref_start, ref_end FROM homolog
+            WHERE comp_taxon_id=:scope AND {0}
+        """.format(_region_filter(db_con, 'homolog', 'ref_taxon_id', 'ref_seq_id', 'ref_start', 'ref_end', params,
+                                  scope))
+    elif feature == 'ont':
+        query = """
+            SELECT gene_start_pos, gene_end_pos FROM gene
+            WHERE {0} AND EXISTS (
+                SELECT 1 FROM gene_ontology_map AS gom
+                WHERE {1}
+                  AND gom.ontology_id LIKE :scope || ':%')
+        """.format(_region_filter(db_con, 'gene', 'gene_taxonid', 'gene_chr', 'gene_start_pos', 'gene_end_pos', params),
+                   _ont_gene_join(db_con))
+    else:
+        raise ValueError('unknown density feature {0!r}'.format(feature))
+
+    counts = [0] * bin_count
+    c = db_con.cursor()
+    c.execute(query, params)
+    for feature_start, feature_end in c:
+        for i, _ in _bin_overlaps(start, end, bin_size, feature_start, feature_end):
+            counts[i] += 1
+    return counts
+
+
 def get_genes(ref_taxonid, ref_chr):
     """
     Gets an iterable of reference genes overlapping with the given reference coordinate range
@@ -290,26 +995,113 @@ def get_genes(ref_taxonid, ref_chr):
         * start_pos: the exon start position in base pairs
         * end_pos: the exon end position in base pairs
     """
-    db_con = sqlite3.connect(DB_PATH)
-    c = db_con.cursor()
+    return _assemble_genes(ref_taxonid, ref_chr)
+
 
+def get_genes_in_region(ref_taxonid, ref_chr, start, end):
+    """
+    Gets an iterable of reference genes overlapping with the given reference coordinate range
+    :param ref_taxonid:     the NCBI taxonomy ID string for the reference
+    :param ref_chr:         the chromosome for the reference coordinate range
+    :param start:           the start position (base pairs) of the reference coordinate range
+    :param end:             the end position (base pairs) of the reference coordinate range
+    :return: an iterable of dictionaries (one per reference gene) sorted by start_pos, as described in get_genes
+    """
+    return _assemble_genes(ref_taxonid, ref_chr, start=start, end=end)
+
+
+def _assemble_genes(ref_taxonid, ref_chr, comp_taxonid=None, start_key='start_pos', end_key='end_pos',
+                    start=None, end=None):
+    """
+    Shared implementation of get_genes, get_chr_genes and get_genes_in_region. Rather than querying homologs and
+    exons one gene at a time, the canonical exons of the homologs, the homologs and the genes (with their own
+    canonical exons) are each fetched with a single query and grouped together in memory.
+
+    :param ref_taxonid:     the NCBI taxonomy ID string for the reference
+    :param ref_chr:         the chromosome for the reference coordinate range
+    :param comp_taxonid:    if given, only homologs from this comparison genome are included
+    :param start_key:       the key used for gene and exon start positions in the returned dictionaries
+    :param end_key:         the key used for gene and exon end positions in the returned dictionaries
+    :param start:           if given along with end, only genes overlapping start-end are included
+    :param end:             see start
+    :return: an iterable of gene dictionaries sorted by start position (see get_genes)
+    """
+    db_con = _get_db_connection()
+    params = {
+        'ref_taxonid': ref_taxonid,
+        'ref_chr': ref_chr,
+        'comp_taxonid': comp_taxonid,
+    }
+
+    if start is None or end is None:
+        gene_filter = 'gene_taxonid=:ref_taxonid AND gene_chr=:ref_chr'
+    else:
+        params.update(_region_params(ref_taxonid, ref_chr, start, end))
+        gene_filter = _region_filter(db_con, 'gene', 'gene_taxonid', 'gene_chr', 'gene_start_pos', 'gene_end_pos',
+                                     params)
+
+    homolog_filter = 'ref_gene_id IN (SELECT gene_id FROM gene WHERE {0})'.format(gene_filter)
+    if comp_taxonid is not None:
+        homolog_filter += ' AND comp_taxon_id=:comp_taxonid'
+
+    e = db_con.cursor()
+    e.execute('''
+        SELECT transcript.gene_id, exon_start_pos, exon_end_pos
+        FROM transcript
+        INNER JOIN exon ON exon.transcript_id = transcript.transcript_id
+        WHERE transcript.is_canonical AND transcript.gene_id IN (SELECT comp_gene_id FROM homolog WHERE {0})
+        ORDER BY transcript.gene_id, exon_start_pos
+    '''.format(homolog_filter), params)
+
+    homolog_exons = {}
+    for gene_id, exon_start_pos, exon_end_pos in e:
+        homolog_exons.setdefault(gene_id, []).append((exon_start_pos, exon_end_pos))
+
+    # The homologs of a gene used to be looked up with "WHERE ref_gene_id = ?", which SQLite answers from the primary
+    # key index (and the joined genes from gene_id_idx), so that's the order the homologs arrays have always had. It
+    # is spelled out here since insertion (rowid) order differs from it.
+    h = db_con.cursor()
+    h.execute('''
+        SELECT comp_seq_id AS gene_chr,
+            comp_end AS gene_end_pos,
+            comp_gene_id AS gene_id,
+            comp_start AS gene_start_pos,
+            comp_strand AS gene_strand,
+            comp_gene_sym AS gene_symbol,
+            comp_taxon_id AS gene_taxonid,
+            ref_gene_id,
+            ref_taxon_id AS ref_taxonid,
+            g.gene_type AS type
+            FROM homolog
+            INNER JOIN gene AS g ON comp_gene_id = g.gene_id
+            WHERE {0}
+            ORDER BY ref_gene_id, ref_taxon_id, comp_gene_id, comp_taxon_id, g.rowid
+    '''.format(homolog_filter), params)
+
+    homologs = {}
+    for hrow in h:
+        hrow_dict = _dictify_row(h, hrow)
+        hrow_dict['canonical_transcript'] = [
+            {start_key: exon_start_pos, end_key: exon_end_pos}
+            for exon_start_pos, exon_end_pos in homolog_exons.get(hrow_dict['gene_id'], [])
+        ]
+        homologs.setdefault(hrow_dict['ref_gene_id'], []).append(hrow_dict)
+
+    c = db_con.cursor()
     c.execute('''
         SELECT *
         FROM
             (
                 SELECT * FROM gene
-                WHERE gene_chr=:ref_chr
+                WHERE {0}
             ) AS gene_interval
             INNER JOIN transcript ON transcript.gene_id = gene_interval.gene_id
             INNER JOIN exon ON exon.transcript_id = transcript.transcript_id
         WHERE
-            gene_interval.gene_taxonid=:ref_taxonid AND transcript.is_canonical
+            transcript.is_canonical
         ORDER BY
             gene_start_pos, gene_id, transcript_id, exon_start_pos
-    ''', {
-        'ref_taxonid': ref_taxonid,
-        'ref_chr': ref_chr,
-    })
+    '''.format(gene_filter), params)
 
     curr_gene_id = None
     curr_gene = None
@@ -320,61 +1112,20 @@ def get_genes(ref_taxonid, ref_chr):
                 yield curr_gene
 
             curr_gene_id = row_dict['gene_id']
-
-            homologs_found = []
-            h = db_con.cursor()
-            symbol = (curr_gene_id,)
-            # h.execute('SELECT * from homolog INNER JOIN gene on comp_gene_id = gene_id where ref_gene_id = ?', symbol)
-            h.execute('''
-                SELECT comp_seq_id AS gene_chr,
-                    comp_end AS gene_end_pos,
-                    comp_gene_id AS gene_id,
-                    comp_start AS gene_start_pos,
-                    comp_strand AS gene_strand,
-                    comp_gene_sym AS gene_symbol,
-                    comp_taxon_id AS gene_taxonid,
-                    ref_gene_id,
-                    ref_taxon_id AS ref_taxonid,
-                    g.gene_type AS type
-                    FROM homolog
-                    INNER JOIN gene AS g ON comp_gene_id = g.gene_id
-                    WHERE ref_gene_id = ?
-            ''', symbol)
-
-            for hrow in h:
-                hrow_dict = _dictify_row(h, hrow)
-                e = db_con.cursor()
-                e.execute('''
-                    SELECT exon_start_pos, exon_end_pos
-                    FROM transcript
-                    INNER JOIN exon ON exon.transcript_id = transcript.transcript_id
-                    WHERE transcript.gene_id = ? AND transcript.is_canonical
-                    ORDER BY exon_start_pos;
-                ''', (hrow_dict["gene_id"], ))
-                hrow_dict['canonical_transcript'] = []
-                for erow in e:
-                    erow_dict = _dictify_row(e, erow)
-                    hrow_dict["canonical_transcript"].append({
-                        'start_pos': erow_dict['exon_start_pos'],
-                        'end_pos': erow_dict['exon_end_pos'],
-                    })
-                homologs_found.append(hrow_dict)
-
-
             curr_gene = {
-                'start_pos': row_dict['gene_start_pos'],
-                'end_pos': row_dict['gene_end_pos'],
+                start_key: row_dict['gene_start_pos'],
+                end_key: row_dict['gene_end_pos'],
                 'strand': row_dict['gene_strand'],
                 'gene_id': curr_gene_id,
                 'gene_symbol': row_dict['gene_symbol'],
                 'type': row_dict['gene_type'],
-                'homologs': homologs_found,
+                'homologs': homologs.get(curr_gene_id, []),
                 'canonical_transcript': [],
             }
 
         curr_gene['canonical_transcript'].append({
-            'start_pos': row_dict['exon_start_pos'],
-            'end_pos': row_dict['exon_end_pos'],
+            start_key: row_dict['exon_start_pos'],
+            end_key: row_dict['exon_end_pos'],
         })
 
     if curr_gene is not None:
@@ -382,7 +1133,17 @@ def get_genes(ref_taxonid, ref_chr):
 
 
 def get_species():
-    db_con = sqlite3.connect(DB_PATH)
+    taxon_pairs = get_taxon_pairs()
+    if taxon_pairs is not None:
+        ref_taxonids = []
+        for pair in taxon_pairs:
+            if pair['ref_taxonid'] not in ref_taxonids:
+                ref_taxonids.append(pair['ref_taxonid'])
+        for ref_taxonid in ref_taxonids:
+            yield {'ref_taxonid': ref_taxonid}
+        return
+
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute(
@@ -403,7 +1164,81 @@ def get_gene_metadata(taxon_id, gene_symbol=None):
     :param gene_symbol: unique gene symbol
     :return: all available database information about the gene
     """
-    db_con = sqlite3.connect(DB_PATH)
+    c = _gene_metadata_cursor(taxon_id, gene_symbol)
+    for row in c:
+        yield _dictify_row(c, row)
+
+
+def get_gene_metadata_columns(taxon_id):
+    """
+    Gets every gene of a species in columns rather than rows (see get_gene_metadata for the columns)
+    :param taxon_id: id of the species the genes belong to
+    :return: a generator of (column names, column types, columns) batches, see _column_batches
+    """
+    return _column_batches(_gene_metadata_cursor(taxon_id), {
+        'gene_id': 'TEXT',
+        'gene_symbol': 'TEXT',
+        'gene_type': 'TEXT',
+        'chr': 'TEXT',
+        'strand': 'TEXT',
+        'start': 'INTEGER',
+        'end': 'INTEGER',
+    })
+
+
+def get_gene_metadata_page(taxon_id, after_symbol=None, after_id=None, limit=1000):
+    """
+    Gets one page of the genes of a species, ordered by symbol and id. Pages are read from the (taxon id, symbol)
+    index starting right after the previous page, so every page costs the same however deep it is.
+    :param taxon_id: id of the species the genes belong to
+    :param after_symbol: the symbol of the last gene of the previous page, None for the first page
+    :param after_id: the id of the last gene of the previous page; if None, every gene with after_symbol is skipped
+    :param limit: the maximum number of genes to return
+    :return: an iterable of gene dictionaries (see get_gene_metadata)
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+
+    c.execute(
+        """
+        SELECT 
+            gene_id, 
+            gene_symbol, 
+            gene_type, 
+            gene_chr AS chr,
+            gene_strand AS strand,
+            gene_start_pos AS start,
+            gene_end_pos AS end   
+        FROM gene
+        WHERE gene_taxonid = :taxonid {cursor_filter}
+        ORDER BY gene_symbol ASC, gene_id ASC
+        LIMIT :limit
+        """.format(cursor_filter=_keyset_filter('gene_symbol', 'gene_id', after_symbol, after_id)), {
+            'taxonid': taxon_id,
+            'after_symbol': after_symbol,
+            'after_id': after_id,
+            'limit': limit,
+        }
+    )
+
+    for row in c:
+        yield _dictify_row(c, row)
+
+
+def _keyset_filter(symbol_col, id_col, after_symbol, after_id):
+    """
+    The condition selecting the rows that come after (:after_symbol, :after_id) when ordering by symbol and id. The
+    symbol range comes first so that it can be used to search the index.
+    """
+    if after_symbol is None:
+        return ''
+    if after_id is None:
+        return 'AND {0} > :after_symbol'.format(symbol_col)
+    return 'AND {0} >= :after_symbol AND ({0} > :after_symbol OR {1} > :after_id)'.format(symbol_col, id_col)
+
+
+def _gene_metadata_cursor(taxon_id, gene_symbol=None):
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     if gene_symbol is not None:
@@ -439,8 +1274,7 @@ def get_gene_metadata(taxon_id, gene_symbol=None):
             """, {'ref_taxonid': taxon_id}
         )
 
-    for row in c:
-        yield _dictify_row(c, row)
+    return c
 
 
 def get_qtl_metadata(taxon_id, qtl_symbol=None):
@@ -449,7 +1283,7 @@ def get_qtl_metadata(taxon_id, qtl_symbol=None):
     :param qtl_symbol: unique qtl symbol
     :return: all available database information about the gene
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     if qtl_symbol is not None:
@@ -485,6 +1319,42 @@ def get_qtl_metadata(taxon_id, qtl_symbol=None):
         yield _dictify_row(c, row)
 
 
+def get_qtl_metadata_page(taxon_id, after_symbol=None, after_id=None, limit=1000):
+    """
+    Gets one page of the QTLs of a species, ordered by symbol and id (see get_gene_metadata_page)
+    :param taxon_id: id of the species the QTLs belong to
+    :param after_symbol: the symbol of the last QTL of the previous page, None for the first page
+    :param after_id: the id of the last QTL of the previous page; if None, every QTL with after_symbol is skipped
+    :param limit: the maximum number of QTLs to return
+    :return: an iterable of QTL dictionaries (see get_qtl_metadata)
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+
+    c.execute(
+        """
+        SELECT 
+            id AS qtl_id,
+            name AS qtl_symbol,
+            seq_id AS chr,
+            start,
+            `end`
+        FROM feature
+        WHERE taxon_id = :taxonid AND type = 'QTL' {cursor_filter}
+        ORDER BY name ASC, id ASC
+        LIMIT :limit
+        """.format(cursor_filter=_keyset_filter('name', 'id', after_symbol, after_id)), {
+            'taxonid': taxon_id,
+            'after_symbol': after_symbol,
+            'after_id': after_id,
+            'limit': limit,
+        }
+    )
+
+    for row in c:
+        yield _dictify_row(c, row)
+
+
 def get_qtls_by_chr(taxon_id, chromosome):
     """
 
@@ -493,7 +1363,7 @@ def get_qtls_by_chr(taxon_id, chromosome):
     :return:
     """
 
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute(
@@ -514,6 +1384,39 @@ def get_qtls_by_chr(taxon_id, chromosome):
         yield _dictify_row(c, row)
 
 
+def get_qtls_in_region(taxon_id, chromosome, start, end):
+    """
+    Gets the QTLs overlapping with the given coordinate range
+    :param taxon_id:    the NCBI taxonomy ID string for the species
+    :param chromosome:  the chromosome for the coordinate range
+    :param start:       the start position (base pairs) of the coordinate range
+    :param end:         the end position (base pairs) of the coordinate range
+    :return: an iterable of dictionaries (one per QTL) sorted by start position, with the same properties as the
+             ones returned by get_qtls_by_chr
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+    params = _region_params(taxon_id, chromosome, start, end)
+
+    c.execute(
+        """
+        SELECT 
+            id AS qtl_id,
+            name AS qtl_symbol,
+            seq_id AS chr,
+            start,
+            `end`
+        FROM feature
+        WHERE type = 'QTL' AND {0}
+        ORDER BY start ASC
+        """.format(_region_filter(db_con, 'feature', 'taxon_id', 'seq_id', 'start', '`end`', params)),
+        params
+    )
+
+    for row in c:
+        yield _dictify_row(c, row)
+
+
 def get_genome_blocks(ref_taxon, comp_taxon):
     """
     Get syntenic blocks between the given reference and comparison genomes
@@ -532,8 +1435,31 @@ def get_genome_blocks(ref_taxon, comp_taxon):
 
     * id: the synteny block id
     """
+    c = _genome_blocks_cursor(ref_taxon, comp_taxon)
+    for row in c:
+        yield _dictify_row(c, row)
 
-    db_con = sqlite3.connect(DB_PATH)
+
+def get_genome_block_columns(ref_taxon, comp_taxon):
+    """
+    Gets the syntenic blocks between two genomes in columns rather than rows (see get_genome_blocks for the columns)
+    :param ref_taxon:       the NCBI ID for the reference genome
+    :param comp_taxon:      the NCBI ID for the comparison genome
+    :return: a generator of (column names, column types, columns) batches, see _column_batches
+    """
+    return _column_batches(_genome_blocks_cursor(ref_taxon, comp_taxon), {
+        'ref_chr': 'TEXT',
+        'ref_start': 'INTEGER',
+        'ref_end': 'INTEGER',
+        'comp_chr': 'TEXT',
+        'comp_start': 'INTEGER',
+        'comp_end': 'INTEGER',
+        'id': 'TEXT',
+    })
+
+
+def _genome_blocks_cursor(ref_taxon, comp_taxon):
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute(
@@ -552,8 +1478,7 @@ def get_genome_blocks(ref_taxon, comp_taxon):
         """, {'ref_taxonid': ref_taxon, 'comp_taxonid': comp_taxon}
     )
 
-    for row in c:
-        yield _dictify_row(c, row)
+    return c
 
 
 def get_chromosome_blocks(ref_taxon, comp_taxon, chr):
@@ -576,7 +1501,7 @@ def get_chromosome_blocks(ref_taxon, comp_taxon, chr):
         * id: the synteny block id
         """
 
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     c.execute(
@@ -605,6 +1530,47 @@ def get_chromosome_blocks(ref_taxon, comp_taxon, chr):
         yield row_dict
 
 
+def get_blocks_in_region(ref_taxon, comp_taxon, ref_chr, start, end):
+    """
+    Gets the syntenic blocks overlapping with the given reference coordinate range
+    :param ref_taxon:   the NCBI ID for the reference genome
+    :param comp_taxon:  the NCBI ID for the comparison genome
+    :param ref_chr:     the reference chromosome for the coordinate range
+    :param start:       the start position (base pairs) of the reference coordinate range
+    :param end:         the end position (base pairs) of the reference coordinate range
+    :return: an iterable of dictionaries (one per block) sorted by start position, with the same properties as the
+             ones returned by get_chromosome_blocks
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+
+    params = _region_params(ref_taxon, ref_chr, start, end)
+    params['comp_taxonid'] = comp_taxon
+    c.execute(
+        """
+        SELECT 
+            ref_chr,
+            ref_start_pos AS ref_start,
+            ref_end_pos AS ref_end,
+            comp_chr,
+            comp_start_pos AS comp_start,
+            comp_end_pos AS comp_end,
+            symbol AS id,
+            same_orientation AS orientation_matches
+        FROM syntenic_block
+        WHERE comp_taxonid=:comp_taxonid AND {0}
+        ORDER BY ref_start_pos
+        """.format(_region_filter(db_con, 'syntenic_block', 'ref_taxonid', 'ref_chr', 'ref_start_pos', 'ref_end_pos',
+                                  params)),
+        params
+    )
+
+    for row in c:
+        row_dict = _dictify_row(c, row)
+        row_dict['orientation_matches'] = row_dict['orientation_matches'] != 0
+        yield row_dict
+
+
 def get_chr_genes(ref_taxonid, comp_taxonid, ref_chr):
     """
     Gets an iterable of reference genes overlapping with the given reference coordinate range
@@ -624,97 +1590,57 @@ def get_chr_genes(ref_taxonid, comp_taxonid, ref_chr):
         * start_pos: the exon start position in base pairs
         * end_pos: the exon end position in base pairs
     """
-    db_con = sqlite3.connect(DB_PATH)
-    c = db_con.cursor()
+    return _assemble_genes(ref_taxonid, ref_chr, comp_taxonid, start_key='start', end_key='end')
 
-    c.execute('''
-        SELECT *
-        FROM
-            (
-                SELECT * FROM gene
-                WHERE gene_chr=:ref_chr
-            ) AS gene_interval
-            INNER JOIN transcript ON transcript.gene_id = gene_interval.gene_id
-            INNER JOIN exon ON exon.transcript_id = transcript.transcript_id
-        WHERE
-            gene_interval.gene_taxonid=:ref_taxonid AND transcript.is_canonical
-        ORDER BY
-            gene_start_pos, gene_id, transcript_id, exon_start_pos
-    ''', {
-        'ref_taxonid': ref_taxonid,
-        'ref_chr': ref_chr,
-    })
-
-    curr_gene_id = None
-    curr_gene = None
-    for row in c:
-        row_dict = _dictify_row(c, row)
-        if row_dict['gene_id'] != curr_gene_id:
-            if curr_gene is not None:
-                yield curr_gene
 
-            curr_gene_id = row_dict['gene_id']
-
-            homologs_found = []
-            h = db_con.cursor()
-            # h.execute('SELECT * from homolog INNER JOIN gene on comp_gene_id = gene_id where ref_gene_id = ?', symbol)
-            h.execute('''
-                SELECT comp_seq_id AS gene_chr,
-                    comp_end AS gene_end_pos,
-                    comp_gene_id AS gene_id,
-                    comp_start AS gene_start_pos,
-                    comp_strand AS gene_strand,
-                    comp_gene_sym AS gene_symbol,
-                    comp_taxon_id AS gene_taxonid,
-                    ref_gene_id,
-                    ref_taxon_id AS ref_taxonid,
-                    g.gene_type AS type
-                    FROM homolog
-                    INNER JOIN gene AS g ON comp_gene_id = g.gene_id
-                    WHERE ref_gene_id=:ref_gene_id AND comp_taxon_id=:comp_taxon_id
-            ''', {
-                'ref_gene_id': curr_gene_id,
-                'comp_taxon_id': comp_taxonid
-            })
-
-            for hrow in h:
-                hrow_dict = _dictify_row(h, hrow)
-                e = db_con.cursor()
-                e.execute('''
-                    SELECT exon_start_pos, exon_end_pos
-                    FROM transcript
-                    INNER JOIN exon ON exon.transcript_id = transcript.transcript_id
-                    WHERE transcript.gene_id = ? AND transcript.is_canonical
-                    ORDER BY exon_start_pos;
-                ''', (hrow_dict["gene_id"], ))
-                hrow_dict['canonical_transcript'] = []
-                for erow in e:
-                    erow_dict = _dictify_row(e, erow)
-                    hrow_dict["canonical_transcript"].append({
-                        'start': erow_dict['exon_start_pos'],
-                        'end': erow_dict['exon_end_pos'],
-                    })
-                homologs_found.append(hrow_dict)
-
-
-            curr_gene = {
-                'start': row_dict['gene_start_pos'],
-                'end': row_dict['gene_end_pos'],
-                'strand': row_dict['gene_strand'],
-                'gene_id': curr_gene_id,
-                'gene_symbol': row_dict['gene_symbol'],
-                'type': row_dict['gene_type'],
-                'homologs': homologs_found,
-                'canonical_transcript': [],
-            }
+def get_materialized_encodings(path):
+    """
+    Gets the content encodings render_payloads.py rendered a response body in for a request path. The paths and
+    encodings are read once per version of the database file, so this doesn't normally touch SQLite.
+    :param path:    the request path
+    :return: a frozenset of content encodings, empty if no body was rendered for the path
+    """
+    get_db_fingerprint()
+    materialized = _db_state['materialized']
+    if materialized is None:
+        materialized = {}
+        db_con = _get_db_connection()
+        if _table_exists(db_con, 'response_cache'):
+            c = db_con.cursor()
+            c.execute('SELECT path, encoding FROM response_cache')
+            for payload_path, encoding in c:
+                materialized.setdefault(payload_path, set()).add(encoding)
+        materialized = {payload_path: frozenset(encodings) for payload_path, encodings in materialized.items()}
+        _db_state['materialized'] = materialized
+    return materialized.get(path, frozenset())
+
+
+def get_materialized_payload(path, encodings):
+    """
+    Gets a response body that was rendered ahead of time by render_payloads.py
+    :param path:        the request path the body was rendered for
+    :param encodings:   the content encodings the client accepts, most preferred first
+    :return: a (body, encoding, mimetype) tuple for the most preferred encoding available, or None if the database
+             has no rendered body for the path in any of the given encodings
+    """
+    db_con = _get_db_connection()
+    if not encodings or not _table_exists(db_con, 'response_cache'):
+        return None
 
-        curr_gene['canonical_transcript'].append({
-            'start': row_dict['exon_start_pos'],
-            'end': row_dict['exon_end_pos'],
-        })
+    c = db_con.cursor()
+    c.execute(
+        """
+        SELECT body, encoding, mimetype
+        FROM response_cache
+        WHERE path = ? AND encoding IN ({seq})
+        """.format(seq=','.join(['?'] * len(encodings))), [path] + list(encodings)
+    )
 
-    if curr_gene is not None:
-        yield curr_gene
+    payloads = {row[1]: (bytes(row[0]), row[1], row[2]) for row in c}
+    for encoding in encodings:
+        if encoding in payloads:
+            return payloads[encoding]
+    return None
 
 
 def get_gene_info(taxon_id, gene_symbol):
@@ -723,7 +1649,7 @@ def get_gene_info(taxon_id, gene_symbol):
     :param gene_symbol: unique gene symbol
     :return: all available database information about the gene
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
     
     c.execute(
@@ -766,13 +1692,102 @@ def get_gene_info(taxon_id, gene_symbol):
         yield row_dict
 
 
+# SQLite builds before 3.32 refuse statements with more than 999 bound variables, so lists of values are bound a
+# chunk at a time
+MAX_QUERY_VARIABLES = 999
+
+
+def _chunks(values, size):
+    """Splits a list into consecutive lists of at most size values"""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def get_genes_info(taxon_id, identifiers):
+    """
+    Gets the genes matching a batch of gene symbols and/or gene IDs, with their homologs, the way get_gene_info gets
+    them for one symbol but with exact matches and a couple of queries per MAX_QUERY_VARIABLES identifiers instead of
+    a couple of queries per gene.
+    :param taxon_id: id of the species the genes belong to
+    :param identifiers: list of gene symbols and/or gene IDs
+    :return: a (genes, unresolved) tuple: the genes in the order of the first identifier matching them (each gene
+             once) and the identifiers that didn't match any gene
+    """
+    db_con = _get_db_connection()
+    c = db_con.cursor()
+
+    identifiers = list(identifiers)
+    unique_identifiers = list(set(identifiers))
+    genes_by_identifier = {}
+    genes_by_id = {}
+    # symbols and IDs are looked up separately, as SQLite would otherwise only use the index for the taxon
+    queries = (
+        (column, chunk)
+        for column in ('gene_symbol', 'gene_id')
+        for chunk in _chunks(unique_identifiers, MAX_QUERY_VARIABLES - 1)
+    )
+    for column, chunk in queries:
+        c.execute(
+            '''
+            SELECT *
+            FROM gene
+                WHERE gene_taxonid=? AND {0} IN ({1})
+                ORDER BY gene_symbol ASC
+            '''.format(column, ','.join(['?'] * len(chunk))), [taxon_id] + chunk
+        )
+        for row in c:
+            row_dict = _dictify_row(c, row)
+            if row_dict['gene_id'] in genes_by_id:
+                continue
+            genes_by_id[row_dict['gene_id']] = row_dict
+            row_dict['homologs'] = []
+            for identifier in (row_dict['gene_symbol'], row_dict['gene_id']):
+                genes_by_identifier.setdefault(identifier, []).append(row_dict)
+
+    gene_ids = list(genes_by_id)
+    for chunk in _chunks(gene_ids, MAX_QUERY_VARIABLES):
+        c.execute(
+            '''
+            SELECT comp_gene_id AS gene_id,
+                comp_seq_id AS gene_chr,
+                comp_gene_sym AS gene_symbol,
+                comp_taxon_id AS gene_taxonid,
+                comp_start AS gene_start_pos,
+                comp_end AS gene_end_pos,
+                comp_strand AS gene_strand,
+                ref_gene_id,
+                ref_taxon_id AS ref_taxonid
+            FROM homolog
+                WHERE ref_gene_id IN ({0})
+            '''.format(','.join(['?'] * len(chunk))), chunk
+        )
+        for row in c:
+            row_dict = _dictify_row(c, row)
+            genes_by_id[row_dict['ref_gene_id']]['homologs'].append(row_dict)
+
+    genes = []
+    unresolved = []
+    seen = set()
+    for identifier in identifiers:
+        matches = genes_by_identifier.get(identifier)
+        if not matches:
+            unresolved.append(identifier)
+            continue
+        for gene in matches:
+            if gene['gene_id'] not in seen:
+                seen.add(gene['gene_id'])
+                genes.append(gene)
+
+    return genes, unresolved
+
+
 def get_qtl_info(taxon_id, name):
     """
     :param taxon_id:
     :param name
     :return: more detailed information about this feature
     """
-    db_con = sqlite3.connect(DB_PATH)
+    db_con = _get_db_connection()
     c = db_con.cursor()
 
     symbol = (taxon_id, name + "%",)
@@ -795,70 +1810,50 @@ def get_species_genes_labeled_with_term(taxon_id, ont_id, ont_term):
         :param: ont_term: gene ontology term
         :return: a list of dictionaries each containing information about an ontology term - gene pair
         """
-    db_conn = sqlite3.connect(DB_PATH)
+    db_conn = _get_db_connection()
 
     cursor = db_conn.cursor()
-    search_symbols = (taxon_id, ont_id + ":%", "%" + ont_term + "%", "%" + ont_term + "%")
+    search_symbols = _ont_term_params(ont_term)
+    search_symbols['taxonid'] = taxon_id
+    search_symbols['ont_id'] = ont_id + ":%"
 
     cursor.execute(
-        '''
-            SELECT DISTINCT ot.id, ot.name
+        _expand_ont_terms('''
+            SELECT DISTINCT ot.id
             FROM on_terms AS ot
                 INNER JOIN gene_ontology_map as otm
-                    ON id = ontology_id  
-            WHERE otm.taxonid = ? 
-                AND ot.id LIKE ? 
-                AND (ot.id LIKE ? OR ot.name LIKE ?) 
-        ''', search_symbols
+                    ON id = ontology_id
+            WHERE otm.taxonid = :taxonid
+                AND ot.id LIKE :ont_id
+                AND {0}
+        '''.format(_ont_term_filter(db_conn, ont_term))) + '''
+            SELECT DISTINCT gom.ontology_id,
+                ot.name,
+                gene.gene_id,
+                gene.gene_chr,
+                gene.gene_taxonid,
+                gene.gene_start_pos,
+                gene.gene_end_pos,
+                gene.gene_strand,
+                gene.gene_symbol,
+                gene.gene_type
+            FROM expanded_terms AS et
+                INNER JOIN gene_ontology_map as gom
+                    ON gom.ontology_id = et.id
+                INNER JOIN on_terms as ot
+                    ON gom.ontology_id = ot.id
+                INNER JOIN gene
+                    ON {0}
+                WHERE gene.gene_taxonid = :taxonid
+        '''.format(_ont_gene_join(db_conn)), search_symbols
     )
 
-    parent_terms = []
+    genes = []
 
     for row in cursor:
-        parent_terms.append(row[0])
-
-    n = len(parent_terms)
+        genes.append(_dictify_row(cursor, row))
 
-    for i in range(0, n):
-        do_search(parent_terms[i], parent_terms, db_conn)
-
-    unique_parents = list(set(parent_terms))
-
-    if len(parent_terms) > 0:
-        query_vals = [taxon_id]
-        query_vals.extend(unique_parents)
-        t = tuple(query_vals)
-
-        cursor.execute(
-            '''
-                SELECT DISTINCT gom.ontology_id,
-                    ot.name,
-                    gene.gene_id,
-                    gene.gene_chr,
-                    gene.gene_taxonid,
-                    gene.gene_start_pos,
-                    gene.gene_end_pos,
-                    gene.gene_strand,
-                    gene.gene_symbol,
-                    gene.gene_type 
-                FROM gene 
-                    INNER JOIN gene_ontology_map as gom 
-                        ON (gene.gene_symbol = gom.gene_id OR gene.gene_id = gom.gene_id)
-                    INNER JOIN on_terms as ot 
-                        ON gom.ontology_id = ot.id
-                    WHERE gene.gene_taxonid = ?
-                        AND gom.ontology_id IN ({seq})
-            '''.format(seq=','.join(['?']*len(unique_parents))), t
-        )
-
-        genes = []
-
-        for row in cursor:
-            genes.append(_dictify_row(cursor, row))
-
-        return genes
-    else:
-        return []
+    return genes
 
 
 def get_genes_labeled_with_term(ont_id, ont_term):
@@ -869,114 +1864,117 @@ def get_genes_labeled_with_term(ont_id, ont_term):
     :param: ont_term: gene ontology term
     :return: a list of dictionaries each containing information about an ontology term - gene pair
     """
-    db_conn = sqlite3.connect(DB_PATH)
+    db_conn = _get_db_connection()
 
     cursor = db_conn.cursor()
-    search_symbols = (ont_id + ":%", "%" + ont_term + "%", "%" + ont_term + "%")
+    search_symbols = _ont_term_params(ont_term)
+    search_symbols['ont_id'] = ont_id + ":%"
 
     cursor.execute(
-        '''
-            SELECT DISTINCT ot.id, ot.name
+        _expand_ont_terms('''
+            SELECT DISTINCT ot.id
             FROM on_terms AS ot
                 INNER JOIN gene_ontology_map as otm
-                    ON id = ontology_id  
-            WHERE ot.id LIKE ? 
-                AND (ot.id LIKE ? OR ot.name LIKE ?) 
-        ''', search_symbols
+                    ON id = ontology_id
+            WHERE ot.id LIKE :ont_id
+                AND {0}
+        '''.format(_ont_term_filter(db_conn, ont_term))) + '''
+            SELECT DISTINCT gom.ontology_id,
+                ot.name,
+                gene.gene_id,
+                gene.gene_chr,
+                gene.gene_taxonid,
+                gene.gene_start_pos,
+                gene.gene_end_pos,
+                gene.gene_strand,
+                gene.gene_symbol,
+                gene.gene_type
+            FROM expanded_terms AS et
+                INNER JOIN gene_ontology_map as gom
+                    ON gom.ontology_id = et.id
+                INNER JOIN on_terms as ot
+                    ON gom.ontology_id = ot.id
+                INNER JOIN gene
+                    ON {0}
+        '''.format(_ont_gene_join(db_conn)), search_symbols
     )
 
-    parent_terms = []
+    genes = []
 
     for row in cursor:
-        parent_terms.append(row[0])
-
-    n = len(parent_terms)
+        genes.append(_dictify_row(cursor, row))
 
-    for i in range(0, n):
-        do_search(parent_terms[i], parent_terms, db_conn)
+    return genes
 
-    unique_parents = list(set(parent_terms))
-
-    if len(parent_terms) > 0:
-        query_vals = unique_parents
-        t = tuple(query_vals)
 
+def get_gt_assoc_info(taxon_id, gene_list):
+    """
+    :param taxon_id: id of the species the genes belong to
+    :param gene_list: list of gene symbols, or a string of gene symbols separated by '|'
+    :return: the distinct types of the genes
+    """
+    db_conn = _get_db_connection()
+    cursor = db_conn.cursor()
+    if not isinstance(gene_list, list):
+        gene_list = gene_list.split("|")
+    gene_names = list(set(gene_list))
+
+    # every chunk of symbols is looked up in the (gene_taxonid, gene_symbol) index
+    gene_types = []
+    seen = set()
+    for chunk in _chunks(gene_names, MAX_QUERY_VARIABLES - 1):
         cursor.execute(
             '''
-                SELECT DISTINCT gom.ontology_id,
-                    ot.name,
-                    gene.gene_id,
-                    gene.gene_chr,
-                    gene.gene_taxonid,
-                    gene.gene_start_pos,
-                    gene.gene_end_pos,
-                    gene.gene_strand,
-                    gene.gene_symbol,
-                    gene.gene_type 
-                FROM gene 
-                    INNER JOIN gene_ontology_map as gom 
-                        ON (gene.gene_symbol = gom.gene_id OR gene.gene_id = gom.gene_id)
-                    INNER JOIN on_terms as ot 
-                        ON gom.ontology_id = ot.id
-                    WHERE gom.ontology_id IN ({seq})
-            '''.format(seq=','.join(['?']*len(unique_parents))), t
+                SELECT DISTINCT gene_type
+                FROM gene
+                    WHERE gene_taxonid = ? AND gene_symbol IN ({seq})
+            '''.format(seq=','.join(['?'] * len(chunk))), [taxon_id] + chunk
         )
-
-        genes = []
-
+        # each chunk's types are distinct, but the same type can come back from several chunks
         for row in cursor:
-            genes.append(_dictify_row(cursor, row))
-
-        return genes
-    else:
-        return []
-
+            if row not in seen:
+                seen.add(row)
+                gene_types.append(_dictify_row(cursor, row))
 
-def get_gt_assoc_info(taxon_id, gene_list):
-    """
-    :param:
-    :param:
-    :return:
-	"""
-    db_conn = sqlite3.connect(DB_PATH)
-    cursor = db_conn.cursor()
-    gene_names = gene_list.split("|")
-	
-    cursor.execute(
-        '''
-            SELECT DISTINCT gene_type 
-            FROM gene
-                WHERE gene_symbol IN ({seq})
-        '''.format(seq=','.join(['?']*len(gene_names))), gene_names
-    )
-	
-    for row in cursor:
-        yield _dictify_row(cursor, row)
+    return gene_types
 
 
-def do_search(parent, parent_terms, db_conn):
+def _ont_gene_join(db_conn):
     """
-    Finds and adds the children of parent to the parent_terms list.
+    Builds the condition joining gene_ontology_map (as gom) to gene. Once db-creation/import_ontology.py has
+    resolved every annotation to the (gene_id, gene_taxonid) key of the gene table it records the
+    gene_ontology_map_resolved marker, and the join is on indexed columns; otherwise (older databases, or an import
+    that didn't get that far) the annotations hold a mix of gene symbols and ids that has to be matched against both.
 
-    :param parent: (ontology) term id
-    :param parent_terms: list with all currently found (ontology) term ids 
-    :param db_conn: SQLite connection object
+    :param db_conn: the database connection the condition will be used with
+    :return: an SQL condition string
     """
-    cursor = db_conn.cursor()
+    if _table_exists(db_conn, 'gene_ontology_map_resolved'):
+        return 'gene.gene_id = gom.gene_id AND gene.gene_taxonid = gom.taxonid'
 
-    cursor.execute("SELECT child FROM on_pairs WHERE parent = ?", (parent,))
-    current_terms = []
+    return '(gene.gene_symbol = gom.gene_id OR gene.gene_id = gom.gene_id)'
 
-    row = cursor.fetchone()
 
-    while row is not None:
-        current_terms.append(row[0])    
-        row = cursor.fetchone()
-    cursor.close()
+def _expand_ont_terms(matched_terms):
+    """
+    Builds a WITH clause defining expanded_terms (id), the given ontology terms along with all of their descendants,
+    for the statement it's prepended to to join against. on_pairs already holds the transitive closure of the is_a
+    relationships (see import_ontology.save_is_a), so a single join against it is enough to reach every generation,
+    and however many descendants a term has they never have to be bound as parameters.
 
-    for term in current_terms:
-        parent_terms.append(term)
-        do_search(term, parent_terms, db_conn)
+    :param matched_terms: a SELECT statement returning the ids of the terms to expand in its first column
+    :return: the WITH clause
+    """
+    return '''
+        WITH matched (id) AS ({0}),
+        expanded_terms (id) AS (
+            SELECT id FROM matched
+            UNION
+            SELECT on_pairs.child
+                FROM matched
+                INNER JOIN on_pairs ON on_pairs.parent = matched.id
+        )
+    '''.format(matched_terms)
 
 
 def _get_homologs(ref_taxonid, comp_taxonid, ref_chr=None):
@@ -998,7 +1996,47 @@ def _get_homologs(ref_taxonid, comp_taxonid, ref_chr=None):
     * comp_end_pos:     the integer end position of the comparison gene
     * comp_strand:      the comparison strand '+' or '-'
     """
-    db_con = sqlite3.connect(DB_PATH)
+    c = _homologs_cursor(ref_taxonid, comp_taxonid, ref_chr)
+    for row in c:
+        yield _dictify_row(c, row)
+
+
+def get_homologs(ref_taxonid, comp_taxonid):
+    """
+    Get every homolog between the given reference and comparison genomes (see _get_homologs)
+    :param ref_taxonid: the NCBI taxonomy ID string for the reference
+    :param comp_taxonid: the NCBI taxonomy ID string for the comparison
+    :return: an iterable of dictionaries (one per homolog) sorted by reference chromosome and start position
+    """
+    return _get_homologs(ref_taxonid, comp_taxonid)
+
+
+def get_homolog_columns(ref_taxonid, comp_taxonid):
+    """
+    Get every homolog between the given reference and comparison genomes in columns rather than rows (see
+    _get_homologs for the columns)
+    :param ref_taxonid: the NCBI taxonomy ID string for the reference
+    :param comp_taxonid: the NCBI taxonomy ID string for the comparison
+    :return: a generator of (column names, column types, columns) batches, see _column_batches
+    """
+    return _column_batches(_homologs_cursor(ref_taxonid, comp_taxonid), {
+        'ref_gene_id': 'TEXT',
+        'ref_taxonid': 'INTEGER',
+        'comp_gene_id': 'TEXT',
+        'comp_taxonid': 'INTEGER',
+        'ref_chr': 'TEXT',
+        'ref_start_pos': 'INTEGER',
+        'ref_end_pos': 'INTEGER',
+        'ref_strand': 'TEXT',
+        'comp_chr': 'TEXT',
+        'comp_start_pos': 'INTEGER',
+        'comp_end_pos': 'INTEGER',
+        'comp_strand': 'TEXT',
+    })
+
+
+def _homologs_cursor(ref_taxonid, comp_taxonid, ref_chr=None):
+    db_con = _get_db_connection()
     c = db_con.cursor()
     if ref_chr is None:
         c.execute('''
@@ -1049,8 +2087,7 @@ def _get_homologs(ref_taxonid, comp_taxonid, ref_chr=None):
             'ref_chr': ref_chr,
         })
 
-    for row in c:
-        yield _dictify_row(c, row)
+    return c
 
 
 def main():
@@ -34,10 +34,6 @@ let FeatureSearch;
          */
         SearchTermInput.prototype.autocomplete = function(category) {
             this._input.typeahead("destroy");
-            // typeahead's 'prefetch' option caches fetched data in browser's local 
-            // storage; previously cached data must be cleared before fetching
-            // the next data in order to keep the autocomplete suggestions relevant
-            localStorage.removeItem("term");
 
             let url = null;
             let tokenizer = "term";
@@ -49,12 +45,14 @@ let FeatureSearch;
                 url = "./fetch-autocomplete-terms/" + category + "/" + JaxSynteny.speciesRef.getSpeciesId() + ".json";
             }
 
+            // suggestions are ranked on the server, which only returns the top
+            // matches for what has been typed so far
             suggestions = new Bloodhound({
                     datumTokenizer: Bloodhound.tokenizers.obj.whitespace(tokenizer),
                     queryTokenizer: Bloodhound.tokenizers.whitespace,
-                    prefetch: {
-                        url: url,
-                        ttl: 5000 // hypothetically, this ttl will cause the prefetch localStorage to clear every 5 min
+                    remote: {
+                        url: url + "?limit=20&q=%QUERY",
+                        wildcard: "%QUERY"
                     }
                 });
  
@@ -15,15 +15,38 @@ def docs():
     return flask.render_template('docs.html')
 
 
+# species parsed from the config files, for databases built without the species table
+_config_species = []
+
+
 @app.route('/')
 @app.route('/index.html')
 def index():
     """
-    Parses the user provided config files and extracts the reference
-    and comparison species taxon_id and name into an object list.
+    Lists the reference and comparison species taxon_id and name, in display order, from the species table recorded
+    by db-creation/build_metadata.py or, for databases built without it, from the user provided config files.
 
     :return:  the rendered with the given context Flask template
     """
+    species_metadata = dba.get_species_metadata()
+    if species_metadata is not None:
+        species = [{'id': s['taxon_id'], 'name': s['name']} for s in species_metadata]
+    else:
+        species = _read_config_species()
+
+    return flask.render_template('index.html', species=species)
+
+
+def _read_config_species():
+    """
+    Parses the user provided config files (only once) and extracts the reference
+    and comparison species taxon_id and name into an object list.
+
+    :return: the species list
+    """
+    if _config_species:
+        return _config_species
+
     species = []
 
     script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -45,4 +68,5 @@ def index():
                     'name': data_loaded['organism']['name'],
                 })
 
-    return flask.render_template('index.html', species=species)
\ No newline at end of file
+    _config_species[:] = species
+    return _config_species
@@ -0,0 +1,167 @@
+"""
+Binary response formats for programmatic consumers of the bulk data routes.
+
+Clients choose a format through the Accept header:
+
+* application/vnd.apache.arrow.stream: an Arrow IPC stream with one record batch per batch of rows read from the
+  database, sent as soon as it's read (requires pyarrow)
+* application/msgpack: a MessagePack map {"length": N, "columns": {name: [N values], ...}}, the same layout as the
+  columnar JSON format (requires msgpack)
+
+Both are built from the columns returned by the sqliteaccess *_columns functions, without a dictionary per row.
+Formats whose package isn't installed are simply not offered, and JSON is served instead.
+"""
+from flask import request, Response, stream_with_context
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_MIMETYPE = 'application/json'
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def available_mimetypes():
+    """
+    :return: the mimetypes that can be served, JSON first so that it wins when the client has no preference
+    """
+    mimetypes = [JSON_MIMETYPE]
+    if pyarrow is not None:
+        mimetypes.append(ARROW_STREAM_MIMETYPE)
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    return mimetypes
+
+
+def negotiate():
+    """
+    :return: the binary mimetype the client of the current request prefers, or None if it should get JSON
+    """
+    mimetype = request.accept_mimetypes.best_match(available_mimetypes())
+    if mimetype in (ARROW_STREAM_MIMETYPE, MSGPACK_MIMETYPE):
+        return mimetype
+    return None
+
+
+def negotiated(view):
+    """
+    Marks a view whose responses can be sent in the binary formats, so that application.httpcache.conditional
+    validates each format separately and makes its responses vary on the Accept header.
+    """
+    view.response_variant = ('Accept', negotiate)
+    return view
+
+
+class _ArrowSink(object):
+    """A write-only file that collects what the Arrow writer writes until it's drained"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# the name of the pyarrow type factory for each declared SQL column type (see sqliteaccess._column_batches)
+_ARROW_TYPES = {
+    'TEXT': 'string',
+    'INTEGER': 'int64',
+    'REAL': 'float64',
+}
+
+
+def iter_arrow_stream(batches):
+    """
+    Encodes column batches as an Arrow IPC stream. The schema is built from the declared column types rather than
+    from the values, so a column that is NULL throughout the first batch keeps its type in the batches after it.
+
+    :param batches: an iterable of (column names, column types, columns) tuples
+    :return: a generator of byte chunks, one per batch
+    """
+    sink = _ArrowSink()
+    writer = None
+    schema = None
+    for names, types, columns in batches:
+        if writer is None:
+            schema = pyarrow.schema([pyarrow.field(name, getattr(pyarrow, _ARROW_TYPES[sql_type])())
+                                     for name, sql_type in zip(names, types)])
+            writer = pyarrow.RecordBatchStreamWriter(pyarrow.PythonFile(sink, mode='w'), schema)
+
+        arrays = [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)]
+        writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, names))
+        yield sink.drain()
+
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def msgpack_columns(batches):
+    """
+    Encodes column batches as a single MessagePack map of columns.
+
+    :param batches: an iterable of (column names, column types, columns) tuples
+    :return: the encoded bytes
+    """
+    names = []
+    columns = []
+    for names, _, batch_columns in batches:
+        if not columns:
+            columns = [[] for _ in names]
+        for column, batch_column in zip(columns, batch_columns):
+            column.extend(batch_column)
+
+    # keys must be text strings: with use_bin_type, Python 2 byte strings (e.g. the column names sqlite3 gives) would
+    # be packed as binary and come out as bytes in clients decoding with raw=False
+    return msgpack.packb({
+        u'length': len(columns[0]) if columns else 0,
+        u'columns': dict(zip([_text(name) for name in names], columns)),
+    }, use_bin_type=True)
+
+
+def _text(name):
+    """:return: the given column name as a unicode string"""
+    return name.decode('utf-8') if isinstance(name, bytes) else name
+
+
+def binary_response(mimetype, batches):
+    """
+    :param mimetype:    the negotiated binary mimetype (see negotiate)
+    :param batches:     an iterable of (column names, column types, columns) tuples, e.g. from a sqliteaccess *_columns
+                        function
+    :return: the response, streamed for Arrow
+    """
+    if mimetype == ARROW_STREAM_MIMETYPE:
+        response = Response(stream_with_context(iter_arrow_stream(batches)), mimetype=mimetype)
+    else:
+        response = Response(msgpack_columns(batches), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+
+"""
+Compares the time it takes to encode the responses of the largest endpoints the way the routes used to (json.dumps,
+or flask.jsonify, which indents the output for requests that aren't made with XMLHttpRequest) with the time it takes
+every JSON backend available to application.serialization.
+
+The query results are fetched once up front so that only encoding is timed. Run it with the application's
+environment, e.g.:
+
+    python benchmark_serialization.py synteny.db
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="benchmark the JSON encoding of the synteny browser's largest responses")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file to take the responses from")
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help="number of times each response is encoded; the fastest time is reported (default: 5)")
+    args = parser.parse_args()
+    return args
+
+
+def _dumps_default(value):
+    return json.dumps(value)
+
+
+def _dumps_jsonify(value):
+    return json.dumps(value, indent=2, separators=(', ', ': '), sort_keys=True) + '\n'
+
+
+def responses(db_path, dba):
+    """
+    Pick the responses to encode: the genome wide blocks, genes and QTLs of the first taxon pair and the genes and
+    anchored blocks of its first reference chromosome.
+    :param db_path: The database file.
+    :param dba: The application's sqliteaccess module.
+    :return: A list of (route, content, the encoder the route used to use) tuples.
+    """
+    db_con = sqlite3.connect(db_path)
+    ref_taxonid, comp_taxonid, ref_chr = db_con.execute('''
+        SELECT ref_taxonid, comp_taxonid, ref_chr
+        FROM syntenic_block
+        ORDER BY ref_taxonid, comp_taxonid, ref_chr
+        LIMIT 1
+    ''').fetchone()
+    db_con.close()
+
+    return [
+        ('/chr-genes/{0}/{1}/{2}'.format(ref_taxonid, comp_taxonid, ref_chr),
+         {'genes': list(dba.get_genes(ref_taxonid, ref_chr))}, _dumps_jsonify),
+        ('/syntenic-blocks/{0}/{1}/{2}-blocks.json'.format(ref_taxonid, comp_taxonid, ref_chr),
+         {'blocks': list(dba.get_blocks(ref_taxonid, comp_taxonid, True, ref_chr))}, _dumps_jsonify),
+        ('/syntenic-blocks/{0}/{1}/blocks.json'.format(ref_taxonid, comp_taxonid),
+         {'blocks': list(dba.get_blocks(ref_taxonid, comp_taxonid))}, _dumps_jsonify),
+        ('/genes/{0}'.format(ref_taxonid),
+         {'genes': list(dba.get_gene_metadata(ref_taxonid))}, _dumps_default),
+        ('/qtls/{0}'.format(ref_taxonid),
+         {'qtls': list(dba.get_qtl_metadata(ref_taxonid))}, _dumps_default),
+    ]
+
+
+def best_time(dumps, value, repeat):
+    """
+    :return: A (fastest time in milliseconds, encoded size in bytes) tuple.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        encoded = dumps(value)
+        times.append(time.time() - start)
+    return min(times) * 1000.0, len(encoded)
+
+
+def main():
+    args = parse_args()
+
+    os.environ['SYNTENY_DB'] = os.path.abspath(args.synteny_db)
+    os.environ['SYNTENY_CACHE_MAX_BYTES'] = '0'
+    from application import sqliteaccess as dba
+    from application import serialization
+
+    backends = sorted(serialization.BACKENDS)
+    print('{0:<50} '.format('route') + ' '.join('{0:>17}'.format(name) for name in ['before'] + backends))
+
+    for route, content, dumps_before in responses(args.synteny_db, dba):
+        before_ms, before_size = best_time(dumps_before, content, args.repeat)
+        columns = ['{0:>8.1f}ms {1:>5}K'.format(before_ms, before_size // 1024)]
+        for backend in backends:
+            ms, size = best_time(serialization.BACKENDS[backend][0], content, args.repeat)
+            columns.append('{0:>8.1f}ms {1:>5}K'.format(ms, size // 1024))
+        print('{0:<50} '.format(route) + ' '.join(columns))
+
+
+if __name__ == '__main__':
+    main()
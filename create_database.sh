@@ -26,3 +26,28 @@ db-creation/homologs_from_file.py $1 db-creation/data-files/MMHomologs.tsv.gz
 # Load the mouse QTLs
 echo Loading mouse QTLs
 db-creation/features_from_gff3_file.py $1 db-creation/data-files/QTL_JBrowse.gff3.gz 10090 -c
+
+# Build the genomic interval (R*Tree) indexes; this must come after the gene,
+# QTL and syntenic block loads
+echo Building interval indexes
+db-creation/build_interval_index.py $1
+
+# Build the full-text index used for type-ahead suggestions
+echo Building autocomplete index
+db-creation/build_search_index.py $1
+
+# Precompute the syntenic block anchor points from the blocks and homologs
+echo Computing syntenic block anchor points
+db-creation/build_anchor_points.py $1
+
+# Precompute the feature density histograms used by zoomed out views
+echo Computing feature density pyramids
+db-creation/build_density_pyramids.py $1
+
+# Export the memory-mapped genome index shared by the server's worker processes
+echo Exporting genome index
+db-creation/build_genome_index.py $1
+
+# Record the build metadata; this must be the last step
+echo Recording build metadata
+db-creation/build_metadata.py $1
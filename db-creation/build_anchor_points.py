@@ -0,0 +1,199 @@
+#! /usr/bin/env python3
+
+"""
+Precomputes the anchor points of every syntenic block. Anchor points pair up
+reference and comparison positions inside a block (the block ends plus the
+ends of every homolog that lies entirely within the block in the block's
+orientation) and are what the browser uses to line up the two genomes.
+
+The points are stored per block as packed arrays of little-endian 32-bit
+integers so that the application only has to read and unpack them.
+
+This must be run after the syntenic_block and homolog tables have been loaded.
+
+This program creates and populates database tables:
+ - syntenic_block_anchor
+"""
+import argparse
+import sqlite3
+import struct
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="precompute the syntenic block anchor points of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file containing the blocks and homologs")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the anchor point table, dropping any existing table first. Rows are
+    keyed the same way as the syntenic_block table.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS syntenic_block_anchor''')
+    c.execute('''
+        CREATE TABLE syntenic_block_anchor (
+            ref_taxonid INTEGER,
+            comp_taxonid INTEGER,
+            ref_chr TEXT,
+            ref_start_pos INTEGER,
+            match_ref_anchor_points BLOB,
+            match_comp_anchor_points BLOB,
+            true_ref_anchor_points BLOB,
+            true_comp_anchor_points BLOB,
+            PRIMARY KEY (ref_taxonid, comp_taxonid, ref_chr, ref_start_pos))
+    ''')
+
+    db_con.commit()
+
+
+def pack_positions(positions):
+    """
+    Pack a sequence of base pair positions into a blob.
+    :param positions: The positions to pack.
+    :return: The packed positions (little-endian 32-bit integers).
+    """
+    return struct.pack('<{0}i'.format(len(positions)), *positions)
+
+
+def block_anchor_points(block, homologs):
+    """
+    Compute the anchor points of a block.
+    :param block: The syntenic_block row.
+    :param homologs: The homologs that start within the block, sorted by
+                     reference start position.
+    :return: A (match anchor points, true anchor points) tuple where each item
+             is a sorted list of (reference position, comparison position)
+             tuples. The match anchor points pair the reference start with the
+             comparison end for blocks (and homologs) in opposite orientations.
+    """
+    match_anchor_points = {}
+    true_anchor_points = {}
+
+    for homolog in homologs:
+        homolog_same_orientation = homolog['ref_strand'] == homolog['comp_strand']
+
+        # we'll only add anchor points from a homolog if it is entirely within
+        # the bounds of the block and has the same orientation as the block
+        homolog_is_good_anchor = \
+            block['same_orientation'] == homolog_same_orientation and \
+            homolog['ref_start'] >= block['ref_start_pos'] and \
+            homolog['ref_end'] <= block['ref_end_pos'] and \
+            homolog['comp_start'] >= block['comp_start_pos'] and \
+            homolog['comp_end'] <= block['comp_end_pos']
+        if not homolog_is_good_anchor:
+            continue
+
+        if homolog_same_orientation:
+            match_anchor_points[homolog['ref_start']] = homolog['comp_start']
+            match_anchor_points[homolog['ref_end']] = homolog['comp_end']
+        else:
+            match_anchor_points[homolog['ref_start']] = homolog['comp_end']
+            match_anchor_points[homolog['ref_end']] = homolog['comp_start']
+
+        true_anchor_points[homolog['ref_start']] = homolog['comp_start']
+        true_anchor_points[homolog['ref_end']] = homolog['comp_end']
+
+    # the block start and end are always anchors
+    if block['same_orientation']:
+        match_anchor_points[block['ref_start_pos']] = block['comp_start_pos']
+        match_anchor_points[block['ref_end_pos']] = block['comp_end_pos']
+    else:
+        match_anchor_points[block['ref_start_pos']] = block['comp_end_pos']
+        match_anchor_points[block['ref_end_pos']] = block['comp_start_pos']
+
+    true_anchor_points[block['ref_start_pos']] = block['comp_start_pos']
+    true_anchor_points[block['ref_end_pos']] = block['comp_end_pos']
+
+    return sorted(match_anchor_points.items()), sorted(true_anchor_points.items())
+
+
+def save_chromosome_anchor_points(db_con, ref_taxonid, comp_taxonid, ref_chr):
+    """
+    Compute and save the anchor points of every block on one reference
+    chromosome. Blocks and homologs are both walked in reference start order,
+    each homolog being assigned to the block it starts in.
+    :param db_con: A connection to an sqlite3 database.
+    :param ref_taxonid: The reference taxon.
+    :param comp_taxonid: The comparison taxon.
+    :param ref_chr: The reference chromosome.
+    :return: Number of blocks processed.
+    """
+    db_con.row_factory = sqlite3.Row
+    params = {
+        'ref_taxonid': ref_taxonid,
+        'comp_taxonid': comp_taxonid,
+        'ref_chr': ref_chr,
+    }
+
+    blocks = db_con.execute('''
+        SELECT * FROM syntenic_block
+        WHERE ref_taxonid=:ref_taxonid AND comp_taxonid=:comp_taxonid AND ref_chr=:ref_chr
+        ORDER BY ref_start_pos
+    ''', params).fetchall()
+
+    homologs = db_con.execute('''
+        SELECT ref_start, ref_end, ref_strand, comp_start, comp_end, comp_strand
+        FROM homolog
+        WHERE ref_taxon_id=:ref_taxonid AND comp_taxon_id=:comp_taxonid AND ref_seq_id=:ref_chr
+        ORDER BY ref_start
+    ''', params)
+    curr_homolog = next(homologs, None)
+
+    c = db_con.cursor()
+    for block in blocks:
+        # a homolog belongs to the block it starts in; the ones starting
+        # before this block (in a gap, or in an earlier block) are skipped
+        block_homologs = []
+        while curr_homolog and curr_homolog['ref_start'] < block['ref_end_pos']:
+            block_homologs.append(curr_homolog)
+            curr_homolog = next(homologs, None)
+
+        match_anchor_points, true_anchor_points = block_anchor_points(block, block_homologs)
+        match_ref, match_comp = zip(*match_anchor_points)
+        true_ref, true_comp = zip(*true_anchor_points)
+
+        c.execute('''
+            INSERT INTO syntenic_block_anchor (
+                ref_taxonid, comp_taxonid, ref_chr, ref_start_pos,
+                match_ref_anchor_points, match_comp_anchor_points,
+                true_ref_anchor_points, true_comp_anchor_points)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (block['ref_taxonid'], block['comp_taxonid'], block['ref_chr'], block['ref_start_pos'],
+              pack_positions(match_ref), pack_positions(match_comp),
+              pack_positions(true_ref), pack_positions(true_comp)))
+
+    db_con.row_factory = None
+    return len(blocks)
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    chromosomes = db_con.execute('''
+        SELECT DISTINCT ref_taxonid, comp_taxonid, ref_chr
+        FROM syntenic_block
+        ORDER BY ref_taxonid, comp_taxonid, ref_chr
+    ''').fetchall()
+
+    for ref_taxonid, comp_taxonid, ref_chr in chromosomes:
+        print("\tComputing anchor points for {0} chr{1} against {2}".format(
+            ref_taxonid, ref_chr, comp_taxonid))
+        save_chromosome_anchor_points(db_con, ref_taxonid, comp_taxonid, ref_chr)
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
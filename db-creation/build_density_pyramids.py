@@ -0,0 +1,188 @@
+#! /usr/bin/env python3
+
+"""
+Precomputes multi-resolution density histograms ("pyramids") of the genes,
+homologs, QTLs and ontology annotated genes along every chromosome, so that
+zoomed out views can be drawn from a handful of counts per bin rather than
+from every feature in the region.
+
+For every taxon, chromosome and kind of feature there is one histogram per
+bin size (10kb to 10Mb), each stored as a packed array of little-endian
+32-bit unsigned counts. Bin i of a histogram covers the bases
+i * bin_size + 1 to (i + 1) * bin_size, and a feature is counted in every bin
+it overlaps.
+
+This must be run after the gene, feature (QTL), homolog and ontology tables
+have been loaded.
+
+This program creates and populates database tables:
+ - density_pyramid
+"""
+import argparse
+import sqlite3
+import struct
+from itertools import groupby
+
+
+BIN_SIZES = (10000, 100000, 1000000, 10000000)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="precompute the feature density histograms of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file containing the features to count")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the density table, dropping any existing table first.
+
+    The kind of feature counted is given by feature (gene, qtl, homolog or ont)
+    and scope: the comparison taxon for homologs, the ontology abbreviation
+    (GO, MP, ...) for ontology annotated genes and an empty string otherwise.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS density_pyramid''')
+    c.execute('''
+        CREATE TABLE density_pyramid (
+            taxon_id INTEGER,
+            chr TEXT,
+            feature TEXT,
+            scope TEXT,
+            bin_size INTEGER,
+            counts BLOB,
+            PRIMARY KEY (taxon_id, chr, feature, scope, bin_size))
+    ''')
+
+    db_con.commit()
+
+
+def count_overlaps(intervals, bin_size):
+    """
+    Count the intervals overlapping every bin of a chromosome.
+    :param intervals: A list of (start, end) tuples.
+    :param bin_size: The size of the bins.
+    :return: A list of counts, one per bin up to the last bin overlapped by an
+             interval.
+    """
+    bin_count = max(max(end for _, end in intervals) - 1, 0) // bin_size + 1
+
+    # each interval adds one to the bins from its first to its last one
+    deltas = [0] * (bin_count + 1)
+    for start, end in intervals:
+        deltas[max(start - 1, 0) // bin_size] += 1
+        deltas[max(end - 1, 0) // bin_size + 1] -= 1
+
+    counts = []
+    count = 0
+    for delta in deltas[:bin_count]:
+        count += delta
+        counts.append(count)
+    return counts
+
+
+def save_pyramids(db_con, taxon_id, feature, scope, select, params=()):
+    """
+    Compute and save the histograms of one kind of feature of a taxon.
+    :param db_con: A connection to an sqlite3 database.
+    :param taxon_id: The taxon the features belong to.
+    :param feature: The kind of feature.
+    :param scope: The scope of the kind of feature.
+    :param select: A query returning the (chromosome, start, end) of every
+                   feature, ordered by chromosome.
+    :param params: The query parameters.
+    :return: Number of features counted.
+    """
+    c = db_con.cursor()
+    rows = db_con.execute(select, params).fetchall()
+
+    for chromosome, chr_rows in groupby(rows, key=lambda row: row[0]):
+        intervals = [(start, end) for _, start, end in chr_rows if start is not None and end is not None]
+        if not intervals:
+            continue
+
+        for bin_size in BIN_SIZES:
+            counts = count_overlaps(intervals, bin_size)
+            c.execute('''
+                INSERT INTO density_pyramid (taxon_id, chr, feature, scope, bin_size, counts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (taxon_id, chromosome, feature, scope, bin_size,
+                  struct.pack('<{0}I'.format(len(counts)), *counts)))
+
+    return len(rows)
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    taxa = [row[0] for row in db_con.execute('''
+        SELECT DISTINCT gene_taxonid FROM gene ORDER BY gene_taxonid
+    ''')]
+    ontologies = [row[0] for row in db_con.execute('''
+        SELECT DISTINCT substr(id, 1, instr(id, ':') - 1) FROM on_terms ORDER BY 1
+    ''')]
+
+    # annotations are only keyed on gene ids once import_ontology.py has
+    # recorded that it resolved them
+    if db_con.execute('''
+        SELECT 1 FROM sqlite_master
+        WHERE type='table' AND name='gene_ontology_map_resolved'
+    ''').fetchone() is not None:
+        ont_gene_join = 'gom.gene_id = gene.gene_id AND gom.taxonid = gene.gene_taxonid'
+    else:
+        ont_gene_join = '(gom.gene_id = gene.gene_id OR gom.gene_id = gene.gene_symbol)'
+
+    for taxon_id in taxa:
+        print("\tCounting genes and QTLs of {0}".format(taxon_id))
+        save_pyramids(db_con, taxon_id, 'gene', '', '''
+            SELECT gene_chr, gene_start_pos, gene_end_pos
+            FROM gene
+            WHERE gene_taxonid = ?
+            ORDER BY gene_chr
+        ''', (taxon_id,))
+        save_pyramids(db_con, taxon_id, 'qtl', '', '''
+            SELECT seq_id, start, `end`
+            FROM feature
+            WHERE taxon_id = ? AND type = 'QTL'
+            ORDER BY seq_id
+        ''', (taxon_id,))
+
+        comp_taxa = [row[0] for row in db_con.execute('''
+            SELECT DISTINCT comp_taxon_id FROM homolog WHERE ref_taxon_id = ?
+        ''', (taxon_id,))]
+        for comp_taxon_id in comp_taxa:
+            print("\tCounting homologs of {0} in {1}".format(taxon_id, comp_taxon_id))
+            save_pyramids(db_con, taxon_id, 'homolog', str(comp_taxon_id), '''
+                SELECT ref_seq_id, ref_start, ref_end
+                FROM homolog
+                WHERE ref_taxon_id = ? AND comp_taxon_id = ?
+                ORDER BY ref_seq_id
+            ''', (taxon_id, comp_taxon_id))
+
+        for ontology in ontologies:
+            print("\tCounting {0} annotated genes of {1}".format(ontology, taxon_id))
+            save_pyramids(db_con, taxon_id, 'ont', ontology, '''
+                SELECT gene_chr, gene_start_pos, gene_end_pos
+                FROM gene
+                WHERE gene_taxonid = ? AND EXISTS (
+                    SELECT 1 FROM gene_ontology_map AS gom
+                    WHERE {0}
+                      AND gom.ontology_id LIKE ?)
+                ORDER BY gene_chr
+            '''.format(ont_gene_join), (taxon_id, ontology + ':%'))
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#! /usr/bin/env python3
+
+"""
+Exports the positions of the genes, features (QTLs), syntenic blocks and
+homologs of every chromosome into a file of numpy arrays next to the database
+(see application/genomeindex.py for its layout). The application memory maps
+the file, so every worker process shares one copy of the index.
+
+This must be run after the gene, feature, syntenic_block and homolog tables
+have been loaded (and re-run if any of them is reloaded or the database is
+vacuumed, since the index refers to rows by rowid).
+
+This program creates and populates database tables:
+ - genome_index
+and writes the file <synteny_db>.index
+"""
+import argparse
+import json
+import os
+import sqlite3
+import struct
+import uuid
+from itertools import groupby
+
+import numpy as np
+
+
+# keep in step with application/genomeindex.py
+MAGIC = b'SYNIDX01'
+ALIGNMENT = 64
+
+# the indexed tables, each with a query returning the (rowid, taxon id,
+# chromosome, scope, start, end) of every row to index, ordered by taxon,
+# chromosome and scope
+INDEXED_TABLES = (
+    ('gene', '''
+        SELECT rowid, gene_taxonid, gene_chr, '', gene_start_pos, gene_end_pos
+        FROM gene
+        WHERE gene_start_pos IS NOT NULL AND gene_end_pos IS NOT NULL
+        ORDER BY 2, 3
+    '''),
+    ('feature', '''
+        SELECT rowid, taxon_id, seq_id, '', start, `end`
+        FROM feature
+        WHERE start IS NOT NULL AND `end` IS NOT NULL
+        ORDER BY 2, 3
+    '''),
+    ('syntenic_block', '''
+        SELECT rowid, ref_taxonid, ref_chr, '', ref_start_pos, ref_end_pos
+        FROM syntenic_block
+        WHERE ref_start_pos IS NOT NULL AND ref_end_pos IS NOT NULL
+        ORDER BY 2, 3
+    '''),
+    ('homolog', '''
+        SELECT rowid, ref_taxon_id, ref_seq_id, comp_taxon_id, ref_start, ref_end
+        FROM homolog
+        WHERE ref_start IS NOT NULL AND ref_end IS NOT NULL
+        ORDER BY 2, 3, 4
+    '''),
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="export the memory-mapped genome index of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file containing the tables to index")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the table recording the index file, dropping any existing table
+    first. The application only uses the file if its id matches.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS genome_index''')
+    c.execute('''
+        CREATE TABLE genome_index (
+            index_id TEXT,
+            file_name TEXT)
+    ''')
+
+    db_con.commit()
+
+
+def interval_sets(db_con, table, select):
+    """
+    Build the interval sets of a table.
+    :param db_con: A connection to an sqlite3 database.
+    :param table: The table being indexed.
+    :param select: A query as described in INDEXED_TABLES.
+    :return: A generator of (key, array) tuples, the array holding the sorted
+             starts, the ends, the running maximum of the ends and the rowids.
+    """
+    rows = db_con.execute(select)
+    for (taxon_id, chromosome, scope), set_rows in groupby(rows, key=lambda row: row[1:4]):
+        rowids, starts, ends = zip(*[(row[0], row[4], row[5]) for row in set_rows])
+        starts = np.array(starts, dtype='<i8')
+        order = np.argsort(starts, kind='mergesort')
+        ends = np.array(ends, dtype='<i8')[order]
+
+        key = '\t'.join([table, str(taxon_id), str(chromosome), str(scope)])
+        yield key, np.concatenate([
+            starts[order],
+            ends,
+            np.maximum.accumulate(ends),
+            np.array(rowids, dtype='<i8')[order],
+        ])
+
+
+def write_index(db_con, path):
+    """
+    Write the index file.
+    :param db_con: A connection to an sqlite3 database.
+    :param path: The file to write.
+    :return: The id of the index.
+    """
+    index_id = uuid.uuid4().hex
+
+    arrays = []
+    intervals = {}
+    offset = 0
+    for table, select in INDEXED_TABLES:
+        print("\tIndexing {0}".format(table))
+        for key, array in interval_sets(db_con, table, select):
+            intervals[key] = [offset, len(array) // 4]
+            arrays.append(array)
+            offset += len(array)
+
+    header = json.dumps({
+        'index_id': index_id,
+        'tables': [table for table, _ in INDEXED_TABLES],
+        'intervals': intervals,
+    }).encode('utf-8')
+    data_offset = (16 + len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    with open(path, 'wb') as index_file:
+        index_file.write(struct.pack('<8sQ', MAGIC, len(header)))
+        index_file.write(header)
+        index_file.write(b'\0' * (data_offset - 16 - len(header)))
+        for array in arrays:
+            index_file.write(array.tobytes())
+
+    return index_id
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    path = args.synteny_db + '.index'
+    index_id = write_index(db_con, path)
+
+    c = db_con.cursor()
+    c.execute('''
+        INSERT INTO genome_index (index_id, file_name)
+        VALUES (?, ?)
+    ''', (index_id, os.path.basename(path)))
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
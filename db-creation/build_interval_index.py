@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+
+"""
+Builds R*Tree interval indexes over the gene, feature and syntenic_block
+tables so that the application can find everything overlapping a genomic
+region in O(log n + k) rather than scanning a whole chromosome.
+
+This must be run after the gene, feature and syntenic_block tables have been
+loaded (and re-run if any of them is reloaded or the database is vacuumed,
+since the indexes refer to rows by rowid).
+
+This program creates and populates database tables:
+ - interval_seq
+ - gene_rtree
+ - feature_rtree
+ - syntenic_block_rtree
+"""
+import argparse
+import sqlite3
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="build the genomic interval indexes of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file containing the tables to index")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the interval index tables, dropping any existing tables first.
+
+    Each (taxon, chromosome) pair is given an integer key in interval_seq which
+    is used as the first dimension of the R*Trees; the second dimension is the
+    start and end position of the indexed row.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS interval_seq''')
+    c.execute('''
+        CREATE TABLE interval_seq (
+            seq_key INTEGER PRIMARY KEY,
+            taxon_id INTEGER,
+            chr TEXT,
+            UNIQUE (taxon_id, chr)
+        )
+    ''')
+
+    for table in ('gene_rtree', 'feature_rtree', 'syntenic_block_rtree'):
+        c.execute('''DROP TABLE IF EXISTS {0}'''.format(table))
+        c.execute('''
+            CREATE VIRTUAL TABLE {0} USING rtree_i32(
+                id,
+                seq_min, seq_max,
+                start_pos, end_pos
+            )
+        '''.format(table))
+
+    db_con.commit()
+
+
+def index_table(db_con, index_table, select):
+    """
+    Load an R*Tree from the rows returned by the select statement.
+    :param db_con: A connection to an sqlite3 database.
+    :param index_table: The R*Tree table to load.
+    :param select: A query returning (rowid, taxon id, chromosome, start, end)
+                   for every row to index.
+    :return: Number of rows indexed.
+    """
+    c = db_con.cursor()
+
+    c.execute('''
+        INSERT OR IGNORE INTO interval_seq (taxon_id, chr)
+            SELECT DISTINCT taxon_id, chr FROM ({0})
+    '''.format(select))
+
+    c.execute('''
+        INSERT INTO {0} (id, seq_min, seq_max, start_pos, end_pos)
+            SELECT indexed.id, seq_key, seq_key, indexed.start_pos, indexed.end_pos
+            FROM ({1}) AS indexed
+            INNER JOIN interval_seq
+                ON interval_seq.taxon_id = indexed.taxon_id AND interval_seq.chr = indexed.chr
+            WHERE indexed.start_pos IS NOT NULL AND indexed.end_pos IS NOT NULL
+    '''.format(index_table, select))
+    return c.rowcount
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    print("\tIndexing genes")
+    index_table(db_con, 'gene_rtree', '''
+        SELECT rowid AS id, gene_taxonid AS taxon_id, gene_chr AS chr,
+               gene_start_pos AS start_pos, gene_end_pos AS end_pos
+        FROM gene
+    ''')
+
+    print("\tIndexing features")
+    index_table(db_con, 'feature_rtree', '''
+        SELECT rowid AS id, taxon_id, seq_id AS chr,
+               start AS start_pos, `end` AS end_pos
+        FROM feature
+    ''')
+
+    print("\tIndexing syntenic blocks")
+    index_table(db_con, 'syntenic_block_rtree', '''
+        SELECT rowid AS id, ref_taxonid AS taxon_id, ref_chr AS chr,
+               ref_start_pos AS start_pos, ref_end_pos AS end_pos
+        FROM syntenic_block
+    ''')
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
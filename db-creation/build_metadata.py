@@ -0,0 +1,190 @@
+#! /usr/bin/env python3
+
+"""
+Records metadata about the database build that the application loads once
+and keeps in memory. The build id changes every time a database is created,
+so the application can use it to tell clients whether their copies of its
+responses are still current. The species and taxon pairs of the database are
+recorded along with what the application's species config files say about
+them, so that neither has to be worked out again on every request.
+
+This should be the last step of loading a database.
+
+This program creates and populates database tables:
+ - build_info
+ - species
+ - taxon_pair
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="record the build metadata of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file to record the metadata of")
+    parser.add_argument(
+        '-c', '--config-dir',
+        default='application/static/js/data',
+        help="the directory holding the application's species config files (*_config.json)")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the metadata tables, dropping any existing tables first.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS build_info''')
+    c.execute('''
+        CREATE TABLE build_info (
+            build_id TEXT,
+            built_at INTEGER)
+    ''')
+
+    c.execute('''DROP TABLE IF EXISTS species''')
+    c.execute('''
+        CREATE TABLE species (
+            taxon_id INTEGER PRIMARY KEY,
+            name TEXT,
+            name_alias TEXT,
+            display_order INTEGER,
+            chromosomes TEXT,
+            data_layers TEXT)
+    ''')
+
+    c.execute('''DROP TABLE IF EXISTS taxon_pair''')
+    c.execute('''
+        CREATE TABLE taxon_pair (
+            ref_taxonid INTEGER,
+            comp_taxonid INTEGER,
+            block_count INTEGER,
+            homolog_count INTEGER,
+            PRIMARY KEY (ref_taxonid, comp_taxonid))
+    ''')
+
+    db_con.commit()
+
+
+def save_build_info(db_con):
+    """
+    Record a new, unique build id and the current time.
+    :param db_con: A connection to an sqlite3 database.
+    :return: The build id.
+    """
+    build_id = uuid.uuid4().hex
+
+    c = db_con.cursor()
+    c.execute('''
+        INSERT INTO build_info (build_id, built_at)
+        VALUES (?, ?)
+    ''', (build_id, int(time.time())))
+
+    return build_id
+
+
+def read_species_configs(config_dir):
+    """
+    Read the organisms of the species config files in the order the
+    application lists them: by their "order" property, configs without one
+    coming last.
+    :param config_dir: The directory holding the *_config.json files.
+    :return: A list of organism dictionaries.
+    """
+    organisms = []
+    for file_name in sorted(os.listdir(config_dir)):
+        if not file_name.endswith('_config.json'):
+            continue
+        with open(os.path.join(config_dir, file_name)) as data_file:
+            data_loaded = json.load(data_file)
+
+        pos = data_loaded['order'] - 1 if 'order' in data_loaded else len(organisms)
+        organisms.insert(pos, data_loaded['organism'])
+
+    return organisms
+
+
+def save_species(db_con, config_dir):
+    """
+    Record the configured species with their chromosomes and the data layers
+    (genes, QTLs and annotations of each ontology) the database has for them.
+    Both are stored as JSON: a list of {"chr": ..., "size": ...} chromosomes
+    and a list of layer names such as ["genes", "qtls", "GO", "MP"].
+    :param db_con: A connection to an sqlite3 database.
+    :param config_dir: The directory holding the *_config.json files.
+    :return: Number of species recorded.
+    """
+    c = db_con.cursor()
+
+    data_layers = {}
+    for taxon_id, _, layer in c.execute('''
+        SELECT DISTINCT gene_taxonid, 0, 'genes' FROM gene
+        UNION ALL
+        SELECT DISTINCT taxon_id, 1, 'qtls' FROM feature WHERE type = 'QTL'
+        UNION ALL
+        SELECT DISTINCT taxonid, 2, substr(ontology_id, 1, instr(ontology_id, ':') - 1) FROM gene_ontology_map
+        ORDER BY 1, 2, 3
+    ''').fetchall():
+        data_layers.setdefault(taxon_id, []).append(layer)
+
+    organisms = read_species_configs(config_dir)
+    for display_order, organism in enumerate(organisms, 1):
+        taxon_id = int(organism['taxon_id'])
+        c.execute('''
+            INSERT INTO species (taxon_id, name, name_alias, display_order, chromosomes, data_layers)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (taxon_id, organism['name'], organism.get('name_alias'), display_order,
+              json.dumps(organism.get('chromosomes', [])), json.dumps(data_layers.get(taxon_id, []))))
+
+    return len(organisms)
+
+
+def save_taxon_pairs(db_con):
+    """
+    Record every pair of reference and comparison species that has syntenic
+    blocks, with its number of blocks and homologs.
+    :param db_con: A connection to an sqlite3 database.
+    :return: Number of taxon pairs recorded.
+    """
+    c = db_con.cursor()
+    c.execute('''
+        INSERT INTO taxon_pair (ref_taxonid, comp_taxonid, block_count, homolog_count)
+            SELECT sb.ref_taxonid, sb.comp_taxonid, COUNT(*),
+                (SELECT COUNT(*) FROM homolog
+                 WHERE ref_taxon_id = sb.ref_taxonid AND comp_taxon_id = sb.comp_taxonid)
+            FROM syntenic_block AS sb
+            GROUP BY sb.ref_taxonid, sb.comp_taxonid
+    ''')
+    return c.rowcount
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    species_count = save_species(db_con, args.config_dir)
+    print("\tRecorded {0} species".format(species_count))
+
+    pair_count = save_taxon_pairs(db_con)
+    print("\tRecorded {0} taxon pairs".format(pair_count))
+
+    build_id = save_build_info(db_con)
+    print("\tRecorded build {0}".format(build_id))
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+
+"""
+Builds the full-text (FTS5) index that backs the type-ahead suggestions of the
+feature search, so that the application can answer a prefix with a short,
+ranked list of terms instead of sending every symbol of a species.
+
+This must be run after the gene, feature (QTL) and ontology tables have been
+loaded.
+
+This program creates and populates database tables:
+ - autocomplete_term
+"""
+import argparse
+import sqlite3
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="build the autocomplete search index of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file containing the tables to index")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the autocomplete index, dropping any existing table first.
+
+    Every suggestion is stored with its search category (gene, qtl or ont) and
+    scope (a taxon id for genes and QTLs, an ontology abbreviation for ontology
+    terms), both of which are indexed so that the category and scope
+    constraints are resolved by the full-text index together with the prefix.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS autocomplete_term''')
+    c.execute('''
+        CREATE VIRTUAL TABLE autocomplete_term USING fts5(
+            term,
+            category,
+            scope,
+            prefix='1 2 3'
+        )
+    ''')
+
+    db_con.commit()
+
+
+def index_terms(db_con, category, select):
+    """
+    Add suggestions to the autocomplete index.
+    :param db_con: A connection to an sqlite3 database.
+    :param category: The search category the suggestions belong to.
+    :param select: A query returning distinct (term, scope) rows.
+    :return: Number of suggestions added.
+    """
+    c = db_con.cursor()
+
+    c.execute('''
+        INSERT INTO autocomplete_term (term, category, scope)
+            SELECT term, ?, scope FROM ({0})
+            WHERE term IS NOT NULL
+    '''.format(select), (category,))
+    return c.rowcount
+
+
+def main():
+    args = parse_args()
+    db_con = sqlite3.connect(args.synteny_db)
+
+    create_tables(db_con)
+
+    print("\tIndexing gene symbols")
+    index_terms(db_con, 'gene', '''
+        SELECT DISTINCT gene_symbol AS term, gene_taxonid AS scope
+        FROM gene
+    ''')
+
+    print("\tIndexing QTL names")
+    index_terms(db_con, 'qtl', '''
+        SELECT DISTINCT name AS term, taxon_id AS scope
+        FROM feature
+        WHERE type = 'QTL'
+    ''')
+
+    print("\tIndexing ontology term names and ids")
+    index_terms(db_con, 'ont', '''
+        SELECT DISTINCT name AS term, substr(id, 1, instr(id, ':') - 1) AS scope
+        FROM on_terms
+        UNION
+        SELECT id AS term, substr(id, 1, instr(id, ':') - 1) AS scope
+        FROM on_terms
+    ''')
+
+    c = db_con.cursor()
+    c.execute('''INSERT INTO autocomplete_term (autocomplete_term) VALUES ('optimize')''')
+
+    db_con.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 import sys
 import argparse
 import sqlite3
+import time
 from flex_open import flex_open
 
 def parse_args():
@@ -169,6 +170,19 @@ def create_tables(db_con):
     c.execute('''CREATE INDEX gene_ont_map_taxonid_id_idx ON
                   gene_ontology_map(ontology_id)''')
 
+    c.execute('''DROP TABLE IF EXISTS gene_ontology_map_unresolved''')
+    c.execute('''
+        CREATE TABLE gene_ontology_map_unresolved (
+            gene_id TEXT,
+            ontology_id TEXT,
+            taxonid INTEGER
+        )
+    ''')
+
+    # only recreated by record_gene_ids_resolved once the annotations are
+    # resolved, so its presence tells the application they are
+    c.execute('''DROP TABLE IF EXISTS gene_ontology_map_resolved''')
+
 def import_ontology(obo_file, db_con):
     c = db_con.cursor()
 
@@ -248,6 +262,103 @@ def import_ontology(obo_file, db_con):
               )
 
 
+def resolve_gene_ids(db_con):
+    """
+    Replace the gene identifiers of the annotations, which depending on the
+    source file are gene symbols or MGI/NCBI ids, with the (gene_id,
+    gene_taxonid) key of the gene table, so that the application can join
+    annotations to genes on indexed columns. An identifier is resolved to every
+    gene of the annotation's taxon having it as its id or its symbol;
+    annotations that match no gene of their taxon are moved to
+    gene_ontology_map_unresolved.
+    :param db_con: connection to the database.
+    :return: None.
+    """
+    c = db_con.cursor()
+
+    c.execute('''
+        CREATE TEMP TABLE loaded_annotation AS
+            SELECT DISTINCT gene_id, ontology_id, taxonid FROM gene_ontology_map
+    ''')
+    c.execute('''DELETE FROM gene_ontology_map''')
+
+    c.execute('''
+        INSERT INTO gene_ontology_map (gene_id, ontology_id, taxonid)
+            SELECT gene.gene_id, la.ontology_id, gene.gene_taxonid
+            FROM loaded_annotation AS la
+                INNER JOIN gene ON gene.gene_id = la.gene_id
+                    AND gene.gene_taxonid = la.taxonid
+            UNION
+            SELECT gene.gene_id, la.ontology_id, gene.gene_taxonid
+            FROM loaded_annotation AS la
+                INNER JOIN gene ON gene.gene_symbol = la.gene_id
+                    AND gene.gene_taxonid = la.taxonid
+    ''')
+    c.execute('''
+        INSERT INTO gene_ontology_map_unresolved (gene_id, ontology_id, taxonid)
+            SELECT gene_id, ontology_id, taxonid
+            FROM loaded_annotation AS la
+            WHERE NOT EXISTS (
+                    SELECT 1 FROM gene
+                    WHERE gene.gene_id = la.gene_id AND gene.gene_taxonid = la.taxonid)
+              AND NOT EXISTS (
+                    SELECT 1 FROM gene
+                    WHERE gene.gene_symbol = la.gene_id AND gene.gene_taxonid = la.taxonid)
+    ''')
+    print("\t{0} annotations could not be resolved to a gene".format(c.rowcount))
+
+    c.execute('''DROP TABLE loaded_annotation''')
+
+
+def record_gene_ids_resolved(db_con):
+    """
+    Mark the annotations as resolved to gene ids. This must only be called
+    once the resolved annotations have been committed: the application joins
+    them to genes on (gene_id, gene_taxonid) when the marker is present and
+    falls back to matching gene symbols as well otherwise.
+    :param db_con: connection to the database.
+    :return: None.
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS gene_ontology_map_resolved''')
+    c.execute('''
+        CREATE TABLE gene_ontology_map_resolved (
+            resolved_at INTEGER
+        )
+    ''')
+    c.execute('''
+        INSERT INTO gene_ontology_map_resolved (resolved_at)
+        VALUES (?)
+    ''', (int(time.time()),))
+
+
+def create_search_index(db_con):
+    """
+    Index the ids and names of the ontology terms for substring searches. With
+    the trigram tokenizer a quoted string of three or more characters matches
+    every term containing it, so the application doesn't need to scan on_terms
+    with LIKE '%...%' patterns.
+    :param db_con: connection to the database.
+    :return: None.
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS on_terms_search''')
+    c.execute('''
+        CREATE VIRTUAL TABLE on_terms_search USING fts5(
+            id,
+            name,
+            tokenize='trigram'
+        )
+    ''')
+    c.execute('''
+        INSERT INTO on_terms_search (id, name)
+            SELECT id, name FROM on_terms
+    ''')
+    c.execute('''INSERT INTO on_terms_search (on_terms_search) VALUES ('optimize')''')
+
+
 def import_gene_ontology(fname, taxonid, db_con):
     c = db_con.cursor()
     with flex_open(fname) as f:
@@ -363,6 +474,15 @@ def main():
     associate_disease_ontology(args.do_annotations, db_con)
     save_is_a(db_con)
 
+    print("\tResolving annotated genes")
+    resolve_gene_ids(db_con)
+    db_con.commit()
+    record_gene_ids_resolved(db_con)
+    db_con.commit()
+
+    print("\tIndexing ontology terms for substring search")
+    create_search_index(db_con)
+
     db_con.commit()
 
 if __name__ == '__main__':
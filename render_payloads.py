@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+
+"""
+Renders the responses of the most requested whole-chromosome endpoints once and stores them, compressed, in the
+response_cache table of the database so that the application can serve them with a single keyed read (see
+jsonAPI.materialized).
+
+This is an optional step that must be run with the application's environment after the database has been fully
+loaded, and again whenever the database is rebuilt. Bodies are always stored gzip encoded, and also brotli encoded
+if the brotli package is installed.
+
+This program creates and populates database tables:
+ - response_cache
+"""
+import argparse
+import gzip
+import io
+import os
+import sqlite3
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="pre-render and compress the chromosome level JSON responses of a synteny database")
+    parser.add_argument(
+        'synteny_db',
+        help="the SQLite3 DB file to render the responses of (and to store them in)")
+    args = parser.parse_args()
+    return args
+
+
+def create_tables(db_con):
+    """
+    Create the response table, dropping any existing table first. Every response body is stored once per content
+    encoding.
+    :param db_con: A connection to an sqlite3 database.
+    :return: None
+    """
+    c = db_con.cursor()
+
+    c.execute('''DROP TABLE IF EXISTS response_cache''')
+    c.execute('''
+        CREATE TABLE response_cache (
+            path TEXT,
+            encoding TEXT,
+            mimetype TEXT,
+            body BLOB,
+            PRIMARY KEY (path, encoding))
+    ''')
+
+    db_con.commit()
+
+
+def gzip_compress(data):
+    """
+    Gzip a response body. The header timestamp is left out so that rendering the same database twice gives the
+    same bytes.
+    :param data: The bytes to compress.
+    :return: The compressed bytes.
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+
+def compress(data):
+    """
+    Compress a response body in every supported content encoding.
+    :param data: The bytes to compress.
+    :return: A list of (encoding, compressed bytes) tuples.
+    """
+    encoded = [('gzip', gzip_compress(data))]
+    if brotli is not None:
+        encoded.append(('br', brotli.compress(data, quality=11)))
+    return encoded
+
+
+def payload_paths(db_con):
+    """
+    List the request paths to render: the genes, blocks and anchored blocks of every reference chromosome of every
+    taxon pair and the QTLs of every chromosome.
+    :param db_con: A connection to an sqlite3 database.
+    :return: A list of request paths.
+    """
+    paths = []
+
+    chromosomes = db_con.execute('''
+        SELECT DISTINCT ref_taxonid, comp_taxonid, ref_chr
+        FROM syntenic_block
+        ORDER BY ref_taxonid, comp_taxonid, ref_chr
+    ''').fetchall()
+    for ref_taxonid, comp_taxonid, ref_chr in chromosomes:
+        paths.append('/chr-genes/{0}/{1}/{2}'.format(ref_taxonid, comp_taxonid, ref_chr))
+        paths.append('/syntenic-blocks/{0}/{1}/{2}'.format(ref_taxonid, comp_taxonid, ref_chr))
+        paths.append('/syntenic-blocks/{0}/{1}/{2}-blocks.json'.format(ref_taxonid, comp_taxonid, ref_chr))
+
+    qtl_chromosomes = db_con.execute('''
+        SELECT DISTINCT taxon_id, seq_id
+        FROM feature
+        WHERE type = 'QTL'
+        ORDER BY taxon_id, seq_id
+    ''').fetchall()
+    for taxon_id, chromosome in qtl_chromosomes:
+        paths.append('/chr-qtls/{0}/{1}'.format(taxon_id, chromosome))
+
+    return paths
+
+
+def main():
+    args = parse_args()
+
+    # the application reads the database location when it's imported. Every response is only rendered once, so
+    # there's no point in caching responses meanwhile
+    os.environ['SYNTENY_DB'] = os.path.abspath(args.synteny_db)
+    os.environ['SYNTENY_CACHE_MAX_BYTES'] = '0'
+    from application import app
+    app.config['SERVE_MATERIALIZED_PAYLOADS'] = False
+    client = app.test_client()
+
+    db_con = sqlite3.connect(args.synteny_db, timeout=60)
+    create_tables(db_con)
+    if brotli is None:
+        print("\tThe brotli package isn't installed, only storing gzip encoded responses")
+
+    c = db_con.cursor()
+    for path in payload_paths(db_con):
+        print("\tRendering {0}".format(path))
+
+        response = client.get(path)
+        if response.status_code != 200:
+            print("\t\tskipped: {0}".format(response.status))
+            continue
+
+        for encoding, body in compress(response.get_data()):
+            c.execute('''
+                INSERT INTO response_cache (path, encoding, mimetype, body)
+                VALUES (?, ?, ?, ?)
+            ''', (path, encoding, response.mimetype, sqlite3.Binary(body)))
+        db_con.commit()
+
+
+if __name__ == '__main__':
+    main()